@@ -1,5 +1,20 @@
+import os
+import random
+
 from google.appengine.ext.appstats import recording
 
+import instrumentation
+
+# Share of requests recorded by Appstats; every request is still counted by
+# the (much cheaper) per-endpoint instrumentation
+APPSTATS_SAMPLE_RATE = float(os.environ.get('APPSTATS_SAMPLE_RATE', '0.01'))
+
 def webapp_add_wsgi_middleware(app):
-  app = recording.appstats_wsgi_middleware(app)
-  return app
+  recorded = recording.appstats_wsgi_middleware(app)
+
+  def sampled(environ, start_response):
+    if random.random() < APPSTATS_SAMPLE_RATE:
+      return recorded(environ, start_response)
+    return app(environ, start_response)
+
+  return instrumentation.middleware(sampled)
@@ -0,0 +1,460 @@
+#!/usr/bin/env python
+
+"""benchmark.py
+
+Udacity conference server-side Python App Engine endpoint benchmarks
+
+Seeds the App Engine testbed stubs (datastore, memcache, task queue, search)
+with synthetic conferences, sessions, speakers and profiles, then calls
+ConferenceApi methods directly.  For every scenario it reports latency
+percentiles, datastore RPCs and entities read per call, and memcache RPCs
+per call, as JSON so that runs can be compared:
+
+    python benchmark.py --sdk ~/google_appengine --output before.json
+    python benchmark.py --sdk ~/google_appengine --conferences 10000 \\
+        --sessions 100000 --profiles 50000 --output big.json
+
+$Id$
+
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date
+from datetime import time as dtime
+
+APP_ID     = 'udacity-p4-conforg'
+USER_EMAIL = 'user0@example.com'
+
+CITIES = ['London', 'Chicago', 'Paris', 'Tokyo', 'Berlin', 'Sydney',
+          'Toronto', 'Madrid', 'Seoul', 'Austin']
+TOPICS = ['Web', 'Mobile', 'Cloud', 'Data', 'Security', 'Design', 'Games',
+          'DevOps', 'AI', 'IoT']
+WORDS  = ['scalable', 'python', 'datastore', 'serverless', 'frontend',
+          'testing', 'machine', 'learning', 'platform', 'summit', 'devfest',
+          'open', 'source', 'performance', 'mobile', 'design']
+TYPES  = ['Not_Specified', 'Workshop', 'Lecture', 'Keynote', 'Demo', 'Panel']
+
+PUT_CHUNK_SIZE = 500
+
+
+def _setupPath(sdk):
+    """Put the App Engine SDK and its bundled libraries on sys.path."""
+    if sdk:
+        sys.path.insert(0, sdk)
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class RpcCounter(object):
+    """Counts API calls and the entities datastore calls return."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = Counter()  # 'service.Method' -> calls
+        self.entities = 0
+
+    def __call__(self, service, call, request, response):
+        self.calls['%s.%s' % (service, call)] += 1
+        if service != 'datastore_v3':
+            return
+        if call == 'Get':
+            self.entities += sum(1 for group in response.entity_list()
+                                 if group.has_entity())
+        elif call in ('RunQuery', 'Next'):
+            self.entities += response.result_size()
+
+
+def _percentile(ordered, pct):
+    """Return the pct-th percentile (nearest rank) of a sorted list."""
+    if not ordered:
+        return None
+    rank = max(int(round(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def _words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def seed(args):
+    """Store the synthetic data set; returns the keys scenarios need."""
+    from google.appengine.ext import ndb
+    from models import Conference, Profile, Registration, Session, Speaker
+    import searchindex
+
+    rng = random.Random(args.seed)
+    opts = {'use_cache': False, 'use_memcache': False}
+
+    def putAll(entities):
+        for i in range(0, len(entities), PUT_CHUNK_SIZE):
+            ndb.put_multi(entities[i:i + PUT_CHUNK_SIZE], **opts)
+
+    profiles = [Profile(key=ndb.Key(Profile, 'user%d@example.com' % i),
+                        displayName='User %d' % i,
+                        mainEmail='user%d@example.com' % i,
+                        teeShirtSize='NOT_SPECIFIED')
+                for i in range(args.profiles)]
+    putAll(profiles)
+    organizers = [prof.key for prof in profiles[:max(args.profiles // 10, 1)]]
+
+    speakers = [Speaker(key=ndb.Key(Speaker, i + 1),
+                        name='Speaker %d' % i,
+                        briefBio=_words(rng, 12))
+                for i in range(args.speakers)]
+    putAll(speakers)
+
+    confs = []
+    for i in range(args.conferences):
+        p_key = organizers[i % len(organizers)]
+        start = date(2016, rng.randint(1, 12), rng.randint(1, 28))
+        max_attendees = rng.choice([0, 10, 50, 100, 500])
+        confs.append(Conference(
+            key=ndb.Key(Conference, i + 1, parent=p_key),
+            name='Conference %d %s' % (i, _words(rng, 2)),
+            description=_words(rng, 20),
+            organizerUserId=p_key.id(),
+            organizerDisplayName='User %s' % p_key.id(),
+            topics=rng.sample(TOPICS, 2),
+            city=rng.choice(CITIES),
+            startDate=start,
+            endDate=start,
+            month=start.month,
+            maxAttendees=max_attendees,
+            seatsAvailable=max_attendees))
+    putAll(confs)
+
+    # One conference holds --big-conference sessions; the rest are spread
+    # evenly over the others
+    def makeSession(conf, n):
+        return Session(
+            key=ndb.Key(Session, n + 1, parent=conf.key),
+            name='Session %d %s' % (n, _words(rng, 2)),
+            highlights=_words(rng, 10),
+            speakerKey=[speakers[rng.randrange(len(speakers))].key
+                        for _ in range(rng.randint(1, 2))],
+            duration=rng.choice([30, 45, 60, 90]),
+            typeOfSession=rng.choice(TYPES),
+            date=conf.startDate,
+            month=conf.startDate.month,
+            startTime=dtime(rng.randint(8, 20), rng.choice([0, 15, 30, 45])),
+            parentConfKey=conf.key)
+    big = confs[0]
+    sessions = [makeSession(big, n) for n in range(args.big_conference)]
+    others = confs[1:] or confs
+    for n in range(args.big_conference, args.big_conference + args.sessions):
+        sessions.append(makeSession(others[n % len(others)], n))
+    putAll(sessions)
+
+    # Every profile registers for a few conferences
+    registrations = []
+    for prof in profiles:
+        for conf in rng.sample(confs, min(3, len(confs))):
+            registrations.append(Registration(
+                key=ndb.Key(Registration, conf.key.urlsafe(),
+                            parent=prof.key),
+                conferenceKey=conf.key))
+    putAll(registrations)
+
+    if args.search:
+        searchindex.indexConferences(confs)
+        searchindex.indexSessions(sessions)
+
+    return {'conference'    : confs[len(confs) // 2],
+            'bigConference' : big,
+            'speaker'       : speakers[0],
+            'sessions'      : sessions[:args.convert]}
+
+
+def _copySessionsFieldByField(sessions):
+    """Copy Sessions into SessionForms with the per-field all_fields() and
+    hasattr() loop that converters.py replaced; the baseline the
+    converters are measured against.
+    """
+    from models import SessionForm, SessionType
+
+    forms = []
+    for sesh in sessions:
+        sf = SessionForm()
+        for field in sf.all_fields():
+            if hasattr(sesh, field.name):
+                # Convert date and startTime fields to strings
+                if field.name == 'date' or field.name == 'startTime':
+                    setattr(sf, field.name, str(getattr(sesh, field.name)))
+                # Convert typeOfSession to enum
+                elif field.name == 'typeOfSession':
+                    setattr(sf, field.name, getattr(SessionType,
+                                                    getattr(sesh, field.name)))
+                # Keys were stored as websafe strings when this loop was
+                # written; convert them so the forms come out the same
+                elif field.name == 'speakerKey':
+                    setattr(sf, field.name, [s_key.urlsafe() for s_key
+                                             in sesh.speakerKey])
+                elif field.name == 'parentConfKey':
+                    setattr(sf, field.name, sesh.parentConfKey.urlsafe())
+                # Just copy over the remaining fields
+                else:
+                    setattr(sf, field.name, getattr(sesh, field.name))
+            elif field.name == 'websafeKey':
+                setattr(sf, field.name, sesh.key.urlsafe())
+        sf.check_initialized()
+        forms.append(sf)
+    return forms
+
+
+def scenarios(data, args):
+    """Return a list of (name, function) pairs to time."""
+    from protorpc import message_types
+    import conference
+    import converters
+    from models import ConferenceQueryForm, ConferenceQueryForms, SessionForm
+
+    api = conference.ConferenceApi()
+    conf = data['conference'].key.urlsafe()
+    big = data['bigConference'].key.urlsafe()
+    speaker = data['speaker'].key.urlsafe()
+    month = str(data['conference'].month)
+
+    def req(container, **kwargs):
+        """Return a request message for an endpoint's request type."""
+        return getattr(container, 'combined_message_class',
+                       container)(**kwargs)
+
+    def query(*filters, **kwargs):
+        return ConferenceQueryForms(filters=[
+            ConferenceQueryForm(field=f, operator=o, value=v)
+            for f, o, v in filters], **kwargs)
+
+    void = message_types.VoidMessage()
+    result = [
+        ('queryConferences',
+         lambda: api.queryConferences(query())),
+        ('queryConferences.summary',
+         lambda: api.queryConferences(query(summary=True))),
+        ('queryConferences.city',
+         lambda: api.queryConferences(query(('CITY', 'EQ', 'London')))),
+        ('queryConferences.topic',
+         lambda: api.queryConferences(query(('TOPIC', 'EQ', 'Cloud')))),
+        ('queryConferences.month',
+         lambda: api.queryConferences(query(('MONTH', 'EQ', month)))),
+        ('queryConferences.cityTopicMaxAttendees',
+         lambda: api.queryConferences(query(('CITY', 'EQ', 'Paris'),
+                                            ('TOPIC', 'EQ', 'Web'),
+                                            ('MAX_ATTENDEES', 'GT', '10')))),
+        ('getConference',
+         lambda: api.getConference(req(
+             conference.CONF_VERSIONED_GET_REQUEST,
+             websafeConferenceKey=conf))),
+        ('getConferencesCreated',
+         lambda: api.getConferencesCreated(req(
+             conference.CONF_CREATED_REQUEST))),
+        ('getConferencesToAttend',
+         lambda: api.getConferencesToAttend(void)),
+        ('getProfile',
+         lambda: api.getProfile(void)),
+        ('getSpeakersByConference',
+         lambda: api.getSpeakersByConference(req(
+             conference.CONF_GET_REQUEST, websafeConferenceKey=conf))),
+        ('getConferenceSessions',
+         lambda: api.getConferenceSessions(req(
+             conference.SESH_GET_REQUEST, websafeConferenceKey=conf))),
+        ('getConferenceSessions.big',
+         lambda: api.getConferenceSessions(req(
+             conference.SESH_GET_REQUEST, websafeConferenceKey=big))),
+        ('getConferenceSessionsByType.big',
+         lambda: api.getConferenceSessionsByType(req(
+             conference.SESH_BY_TYPE_GET_REQUEST,
+             websafeConferenceKey=big, typeOfSession='Workshop'))),
+        ('getConferenceSessionsByDate.big',
+         lambda: api.getConferenceSessionsByDate(req(
+             conference.SESH_BY_DATE_GET_REQUEST, websafeConferenceKey=big,
+             date=str(data['bigConference'].startDate)))),
+        ('getConferenceSessionsByTimeAndType.big',
+         lambda: api.getConferenceSessionsByTimeAndType(req(
+             conference.SESH_BY_TIME_AND_TYPE_GET_REQUEST,
+             websafeConferenceKey=big, noLaterThen='19:00',
+             typeOfSession='Workshop'))),
+        ('getSessionsBySpeaker',
+         lambda: api.getSessionsBySpeaker(req(
+             conference.SESH_BY_SPEAKER_GET_REQUEST, speakerKey=speaker))),
+        ('getAnnouncement',
+         lambda: api.getAnnouncement(req(conference.VERSIONED_GET_REQUEST))),
+        ('getFeaturedSpeaker',
+         lambda: api.getFeaturedSpeaker(req(
+             conference.CONF_VERSIONED_GET_REQUEST,
+             websafeConferenceKey=conf))),
+        ('converters.copyAllToForms',
+         lambda: converters.copyAllToForms(data['sessions'], SessionForm)),
+        ('converters.fieldByFieldBaseline',
+         lambda: _copySessionsFieldByField(data['sessions'])),
+    ]
+    if args.search:
+        result.extend([
+            ('searchConferences',
+             lambda: api.searchConferences(req(
+                 conference.SEARCH_REQUEST, query='python'))),
+            ('searchSessions',
+             lambda: api.searchSessions(req(
+                 conference.SEARCH_REQUEST, query='datastore'))),
+        ])
+    if args.only:
+        result = [(name, func) for name, func in result
+                  if any(name.startswith(prefix) for prefix in args.only)]
+    return result
+
+
+def run(name, func, counter, args):
+    """Time func and return its results as a dict."""
+    from google.appengine.api import memcache
+    from google.appengine.ext import ndb
+    import cache
+
+    latencies = []
+    calls = Counter()
+    entities = 0
+    errors = 0
+    first_error = None
+    for i in range(args.warmup + args.iterations):
+        # every request starts with an empty ndb context cache
+        ndb.get_context().clear_cache()
+        if args.cold:
+            memcache.flush_all()
+            cache.clear()
+        counter.reset()
+        start = time.time()
+        try:
+            func()
+        except Exception as e:
+            errors += 1
+            first_error = first_error or '%s: %s' % (type(e).__name__, e)
+        elapsed = (time.time() - start) * 1000
+        if i >= args.warmup:
+            latencies.append(elapsed)
+            calls.update(counter.calls)
+            entities += counter.entities
+    latencies.sort()
+    n = float(args.iterations)
+    datastore = dict((call, count / n) for call, count in calls.items()
+                     if call.startswith('datastore_v3.'))
+    return {
+        'name'                 : name,
+        'iterations'           : args.iterations,
+        'errors'               : errors,
+        'firstError'           : first_error,
+        'latencyMs'            : {
+            'mean' : sum(latencies) / n,
+            'p50'  : _percentile(latencies, 50),
+            'p90'  : _percentile(latencies, 90),
+            'p99'  : _percentile(latencies, 99),
+            'max'  : latencies[-1],
+        },
+        'datastoreRpcsPerCall' : sum(datastore.values()),
+        'datastoreRpcs'        : datastore,
+        'entitiesReadPerCall'  : entities / n,
+        'memcacheRpcsPerCall'  : sum(count for call, count in calls.items()
+                                     if call.startswith('memcache.')) / n,
+    }
+
+
+def _revision():
+    """Return the current git revision, if any."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--sdk', help='path to the App Engine SDK')
+    parser.add_argument('--conferences', type=int, default=1000)
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--profiles', type=int, default=5000)
+    parser.add_argument('--speakers', type=int, default=500)
+    parser.add_argument('--big-conference', type=int, default=1000,
+                        help='sessions in the one large conference')
+    parser.add_argument('--convert', type=int, default=10000,
+                        help='sessions copied by the converter scenario')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--cold', action='store_true',
+                        help='flush memcache and the instance cache '
+                             'before every call')
+    parser.add_argument('--search', action='store_true',
+                        help='also index the data and time the search '
+                             'endpoints')
+    parser.add_argument('--only', action='append',
+                        help='only run scenarios starting with this name')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write JSON results to this file')
+    args = parser.parse_args(argv)
+
+    _setupPath(args.sdk)
+    from google.appengine.api import apiproxy_stub_map
+    from google.appengine.datastore import datastore_stub_util
+    from google.appengine.ext import testbed
+
+    bed = testbed.Testbed()
+    bed.activate()
+    # endpoints needs a major.minor version id
+    bed.setup_env(app_id=APP_ID, current_version_id='v1.1', overwrite=True)
+    os.environ['ENDPOINTS_AUTH_EMAIL'] = USER_EMAIL
+    os.environ['ENDPOINTS_AUTH_DOMAIN'] = 'example.com'
+    bed.init_datastore_v3_stub(
+        consistency_policy=datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+            probability=1))
+    bed.init_memcache_stub()
+    bed.init_taskqueue_stub(
+        root_path=os.path.dirname(os.path.abspath(__file__)))
+    bed.init_search_stub()
+    bed.init_app_identity_stub()
+    bed.init_mail_stub()
+    bed.init_urlfetch_stub()
+
+    try:
+        start = time.time()
+        data = seed(args)
+        seeded = time.time() - start
+        counter = RpcCounter()
+        # hooks must be functions or methods, not callable objects
+        apiproxy_stub_map.apiproxy.GetPostCallHooks().Append(
+            'benchmark', counter.__call__)
+        results = [run(name, func, counter, args)
+                   for name, func in scenarios(data, args)]
+    finally:
+        bed.deactivate()
+
+    report = {
+        'revision'  : _revision(),
+        'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python'    : sys.version.split()[0],
+        'scale'     : {'conferences'   : args.conferences,
+                       'sessions'      : args.sessions,
+                       'profiles'      : args.profiles,
+                       'speakers'      : args.speakers,
+                       'bigConference' : args.big_conference},
+        'cold'      : args.cold,
+        'seedSecs'  : seeded,
+        'results'   : results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print output
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""cache.py
+
+Udacity conference server-side Python App Engine entity cache;
+    a small per-instance LRU in front of ndb's own memcache layer
+
+$Id$
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from google.appengine.ext import ndb
+
+# Entries kept per instance and how long (seconds) they stay fresh
+LRU_SIZE = 500
+LRU_TTL  = 30
+
+_lock   = threading.Lock()
+_lru    = OrderedDict()  # urlsafe key -> (expires, entity protobuf)
+_counts = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_adapter = ndb.ModelAdapter()
+
+
+def getEntity(key):
+    """Return the entity for key, reading through the instance cache.
+
+    Misses fall through to key.get(), which ndb serves from memcache
+    before touching the datastore.  Inside a transaction the cache is
+    bypassed so that reads stay transactional.
+
+    Invalidation only reaches this instance, so an entity read here may
+    be up to LRU_TTL seconds older than a write made elsewhere.  Use it
+    on read-only paths; code that changes and put()s the entity must
+    read it with key.get() or in a transaction.
+    """
+    return getEntityAsync(key).get_result()
+
+
+@ndb.tasklet
+def getEntityAsync(key):
+    """Tasklet version of getEntity, so lookups can overlap."""
+    if ndb.in_transaction():
+        entity = yield key.get_async()
+        raise ndb.Return(entity)
+    wsk = key.urlsafe()
+    now = time.time()
+    with _lock:
+        entry = _lru.get(wsk)
+        if entry and entry[0] > now:
+            # Refresh the entry's position in the LRU
+            del _lru[wsk]
+            _lru[wsk] = entry
+            _counts['hits'] += 1
+            # Hand out a fresh copy so callers can mutate it freely
+            raise ndb.Return(_adapter.pb_to_entity(entry[1]))
+        _counts['misses'] += 1
+    entity = yield key.get_async()
+    if entity is not None:
+        _store(wsk, entity, now)
+    raise ndb.Return(entity)
+
+
+def _store(wsk, entity, now):
+    """Add an entity to the instance cache, evicting the oldest entries."""
+    pb = entity._to_pb()
+    with _lock:
+        _lru.pop(wsk, None)
+        _lru[wsk] = (now + LRU_TTL, pb)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def invalidate(key):
+    """Drop key from the instance cache, now and again on commit."""
+    def _drop():
+        with _lock:
+            if _lru.pop(key.urlsafe(), None) is not None:
+                _counts['invalidations'] += 1
+    _drop()
+    # Runs immediately outside of a transaction
+    ndb.get_context().call_on_commit(_drop)
+
+
+def clear():
+    """Empty the instance cache, e.g. to benchmark cold reads."""
+    with _lock:
+        _lru.clear()
+
+
+def stats():
+    """Return the instance cache counters as a dict."""
+    with _lock:
+        result = dict(_counts)
+        result['size'] = len(_lru)
+    return result
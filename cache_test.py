@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""cache_test.py
+
+Udacity conference server-side Python App Engine entity cache tests
+
+Reads entities through cache.getEntity on the App Engine testbed stubs:
+
+    APPENGINE_SDK=~/google_appengine python cache_test.py
+
+$Id$
+
+"""
+
+import os
+import sys
+import unittest
+
+
+def _setupPath(sdk):
+    """Put the App Engine SDK and its bundled libraries on sys.path."""
+    if sdk:
+        sys.path.insert(0, os.path.expanduser(sdk))
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class GetEntityTest(unittest.TestCase):
+
+    def setUp(self):
+        from google.appengine.ext import ndb
+        from google.appengine.ext import testbed
+        import cache
+        from models import Profile
+
+        self.bed = testbed.Testbed()
+        self.bed.activate()
+        self.bed.setup_env(app_id='udacity-p4-conforg', overwrite=True)
+        self.bed.init_datastore_v3_stub()
+        self.bed.init_memcache_stub()
+        ndb.get_context().clear_cache()
+        self.cache = cache
+        cache.clear()
+        self.key = Profile(key=ndb.Key(Profile, 'user0@example.com'),
+                           displayName='User 0',
+                           mainEmail='user0@example.com',
+                           sessionWishList=[ndb.Key('Session', 1)]).put()
+
+    def tearDown(self):
+        self.cache.clear()
+        self.bed.deactivate()
+
+    def testColdThenWarm(self):
+        before = self.cache.stats()
+        cold = self.cache.getEntity(self.key)
+        self.assertEqual(cold.displayName, 'User 0')
+        self.assertEqual(cold.key, self.key)
+        after = self.cache.stats()
+        self.assertEqual(after['misses'], before['misses'] + 1)
+        self.assertEqual(after['size'], 1)
+
+        warm = self.cache.getEntity(self.key)
+        self.assertEqual(self.cache.stats()['hits'], after['hits'] + 1)
+        self.assertEqual(warm, cold)
+        self.assertEqual(warm.key, self.key)
+        # every hit hands out its own copy
+        warm.displayName = 'Changed'
+        self.assertEqual(self.cache.getEntity(self.key).displayName,
+                         'User 0')
+
+    def testInvalidate(self):
+        self.cache.getEntity(self.key)
+        self.cache.invalidate(self.key)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def testMissingEntity(self):
+        from google.appengine.ext import ndb
+        from models import Profile
+
+        missing = ndb.Key(Profile, 'nobody@example.com')
+        self.assertIsNone(self.cache.getEntity(missing))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+
+if __name__ == '__main__':
+    _setupPath(os.getenv('APPENGINE_SDK'))
+    unittest.main()
@@ -13,38 +13,58 @@ created by wesc on 2014 apr 21
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
 
+import hashlib
+import time
+from collections import Counter
 from datetime import datetime
 
 import endpoints
 from protorpc import messages
 from protorpc import message_types
+from protorpc import protobuf
 from protorpc import remote
 
 from google.appengine.api import memcache
+from google.appengine.api import search
 from google.appengine.api import taskqueue
 from google.appengine.ext import ndb
 
+from models import AttendeeForm
+from models import AttendeeForms
 from models import ConflictException
 from models import Profile
 from models import ProfileMiniForm
 from models import ProfileForm
+from models import Registration
 from models import BooleanMessage
 from models import Conference
 from models import ConferenceForm
 from models import ConferenceForms
 from models import ConferenceQueryForms
+from models import NearlySoldOut
 from models import Session
 from models import SessionForm
 from models import SessionForms
+from models import SessionKeysForm
 from models import SessionType
 from models import Speaker
 from models import SpeakerForm
 from models import SpeakerForms
+from models import SpeakerCount
+from models import SpeakerSession
 from models import TeeShirtSize
 from models import StringMessage
 
 from utils import getUserId
 
+import cache
+import converters
+import indexadvisor
+import outbox
+import searchindex
+import seats
+import versions
+
 from settings import WEB_CLIENT_ID
 
 EMAIL_SCOPE = endpoints.EMAIL_SCOPE
@@ -52,13 +72,16 @@ API_EXPLORER_CLIENT_ID = endpoints.API_EXPLORER_CLIENT_ID
 
 # Memcache keys
 MEMCACHE_ANNOUNCEMENTS_KEY    = "RECENT_ANNOUNCEMENTS"
-MEMCACHE_FEATURED_SPEAKER_KEY = "FEATURED_SPEAKER"
+MEMCACHE_FEATURED_SPEAKER_KEY = "FEATURED_SPEAKER_%s"  # % websafeConferenceKey
+MEMCACHE_LOCK_KEY             = "%s_LOCK"  # % memcache key being rebuilt
+MEMCACHE_CONF_QUERY_KEY       = "CONF_QUERY_%s"  # % hash of the query
+MEMCACHE_SPEAKER_SESSIONS_KEY = "SPEAKER_SESSIONS_%s"  # % websafeSpeakerKey
+MEMCACHE_CONF_SPEAKERS_KEY    = "CONF_SPEAKER_SET_%s"  # % websafeConfKey
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 CONF_DEFAULTS = {'city'           : 'Default City',
                  'maxAttendees'   : 0,
-                 'seatsAvailable' : 0,
                  'topics'         : ['Default', 'Topic'],
                  }
 
@@ -80,35 +103,120 @@ FIELDS = {'CITY'          : 'city',
           'MAX_ATTENDEES' : 'maxAttendees',
           }
 
+# Fields filled in by the summary mode of the listing endpoints; the
+# full details are loaded on demand
+CONF_SUMMARY_FIELDS = ('name', 'city', 'startDate', 'websafeKey')
+SESH_SUMMARY_FIELDS = ('name', 'date', 'startTime', 'websafeKey')
+
+# Page size limits for queryConferences
+QUERY_PAGE_SIZE     = 20
+QUERY_MAX_PAGE_SIZE = 100
+
+# Seconds a built queryConferences response stays cached; any change to
+# a Conference or its seats retires it sooner
+QUERY_CACHE_TTL = 600
+
+# Page size limits for getSessionsBySpeaker
+SPEAKER_SESSIONS_PAGE_SIZE     = 20
+SPEAKER_SESSIONS_MAX_PAGE_SIZE = 100
+
+# Page size limits for searchConferences and searchSessions
+SEARCH_PAGE_SIZE     = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+# Limits for createSessionsBulk
+BULK_MAX_SESSIONS   = 1000
+BULK_PUT_CHUNK_SIZE = 100
+
+# Sessions a speaker needs in a conference to become its featured speaker
+FEATURED_SPEAKER_MIN_SESSIONS = 2
+
+# Conferences rewritten per batch when an organizer renames themselves
+ORGANIZER_UPDATE_BATCH_SIZE = 100
+
+# Conferences with at most this many seats left are nearly sold out
+NEARLY_SOLD_OUT_SEATS = 5
+
+# Conferences checked per batch when rescanning the nearly sold out set
+ANNOUNCEMENT_BATCH_SIZE = 100
+
+# Seconds a memcache rebuild lock is held, and how often (and how many
+# times) other requests check for the rebuilt value meanwhile
+REBUILD_LOCK_TIMEOUT = 10
+REBUILD_LOCK_WAIT    = 0.05
+REBUILD_LOCK_TRIES   = 10
+
+NEARLY_SOLD_OUT_KEY = ndb.Key(NearlySoldOut, 'announcement')
+
 
 CONF_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage, websafeConferenceKey=messages.StringField(1))
 
+CONF_VERSIONED_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey = messages.StringField(1),
+    version              = messages.StringField(2))
+
+VERSIONED_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    version = messages.StringField(1))
+
 CONF_POST_REQUEST = endpoints.ResourceContainer(
     ConferenceForm, websafeConferenceKey=messages.StringField(1))
 
 SESH_POST_REQUEST = endpoints.ResourceContainer(
     SessionForm, websafeConferenceKey=messages.StringField(1))
 
+CONF_ATTENDEES_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey = messages.StringField(1, required=True),
+    pageSize             = messages.IntegerField(2),
+    websafeCursor        = messages.StringField(3))
+
+SEARCH_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    query                = messages.StringField(1, required=True),
+    pageSize             = messages.IntegerField(2),
+    websafeCursor        = messages.StringField(3),
+    websafeConferenceKey = messages.StringField(4))  # searchSessions only
+
+CONF_CREATED_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    summary = messages.BooleanField(1))
+
+SESH_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey = messages.StringField(1),
+    summary              = messages.BooleanField(2),
+    version              = messages.StringField(3))
+
 SESH_BY_TYPE_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeConferenceKey = messages.StringField(1, required=True),
-    typeOfSession        = messages.StringField(2, required=True))
+    typeOfSession        = messages.StringField(2, required=True),
+    summary              = messages.BooleanField(3))
 
 SESH_BY_DATE_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeConferenceKey = messages.StringField(1, required=True),
-    date                 = messages.StringField(2, required=True))
+    date                 = messages.StringField(2, required=True),
+    summary              = messages.BooleanField(3))
 
 SESH_BY_SPEAKER_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
-    speakerKey = messages.StringField(1, required=True))
+    speakerKey           = messages.StringField(1, required=True),
+    websafeConferenceKey = messages.StringField(2),
+    startDate            = messages.StringField(3),
+    endDate              = messages.StringField(4),
+    pageSize             = messages.IntegerField(5),
+    websafeCursor        = messages.StringField(6))
 
 SESH_BY_TIME_AND_TYPE_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeConferenceKey = messages.StringField(1, required=True),
     noLaterThen          = messages.StringField(2, required=True),
-    typeOfSession        = messages.StringField(3, required=True))
+    typeOfSession        = messages.StringField(3, required=True),
+    summary              = messages.BooleanField(4))
 
 SESH_POST_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
@@ -125,16 +233,10 @@ class ConferenceApi(remote.Service):
 
 # - - - Speaker objects - - - - - - - - - - - - - - - - -
 
-    def _copySpeakerToForm(self, speaker):
-        """Copy relevant fields from Speaker to SpeakerForm"""
-        sf = SpeakerForm()
-        for field in sf.all_fields():
-            if hasattr(speaker, field.name):
-                setattr(sf, field.name, getattr(speaker, field.name))
-            elif field.name == "websafeKey":
-                setattr(sf, field.name, speaker.key.urlsafe())
-        sf.check_initialized()
-        return sf
+    def _copySpeakersToForms(self, speakers):
+        """Copy relevant fields from Speakers to SpeakerForms"""
+        return SpeakerForms(
+            items = converters.copyAllToForms(speakers, SpeakerForm))
 
     def _createSpeakerObject(self, request):
         """Create a Speaker object, returning SpeakerForm/request."""
@@ -157,13 +259,11 @@ class ConferenceApi(remote.Service):
         # create Session, send email to organizer confirming
         # creation of Session & return (modified) SessionForm
         Speaker(**data).put()
-        taskqueue.add(
-            params = {
-                'email'   : user.email(),
-                'subject' : 'You Added %s as a Speaker!' % data['name'],
-                'body'    : 'Here are the details for the added speaker:',
-                'info'    : repr(request)},
-            url    = '/tasks/send_confirmation_email')
+        outbox.queueEmail(
+            email   = user.email(),
+            subject = 'You Added %s as a Speaker!' % data['name'],
+            body    = 'Here are the details for the added speaker:',
+            info    = repr(request))
         return request
 
     @endpoints.method(SpeakerForm, SpeakerForm,
@@ -192,80 +292,110 @@ class ConferenceApi(remote.Service):
         except Exception:
             raise endpoints.BadRequestException(
                 'The websafeConferenceKey given is invalid.')
+        # Look up the Conference and its Speakers at the same time
+        conf_future = c_key.get_async()
+        speakers_future = self._getConferenceSpeakersAsync(c_key)
         # Verify that the conference exists
-        conf = c_key.get()
-        if not conf:
+        if not conf_future.get_result():
             raise endpoints.NotFoundException(
                 'No conference found for the key provided: %s'
                 % request.websafeConferenceKey)
-        # Store the Sessions that are ancestors of the Conference
-        sessions = Session.query(ancestor=c_key)
-        # Retrieve Speaker Keys from each Session in a Conference
-        speakerKeys = set([])
-        for sesh in sessions:
-            for wssk in sesh.speakerKey:
-                speaker_key = ndb.Key(urlsafe=wssk)
-                # Utilize add to set to eliminate duplicate results
-                speakerKeys.add(speaker_key)
-        # Get each speaker using its key and appended it to the final list
-        speakers = []
-        for spkr in speakerKeys:
-            speaker = spkr.get()
-            speakers.append(speaker)
         # Return a SpeakerForm for each Speaker
-        return SpeakerForms(
-            items = [self._copySpeakerToForm(
-                spkr) for spkr in speakers])
+        return self._copySpeakersToForms(speakers_future.get_result())
+
+    @staticmethod
+    @ndb.tasklet
+    def _getConferenceSpeakersAsync(c_key):
+        """Return the Speakers used by a Conference's Sessions.
+
+        The set of Speaker keys is cached in memcache per conference under
+        the version of the conference's Sessions, which moves whenever a
+        Session is added.  The version is read before the query, so a set
+        built from a query that missed a new Session is cached under the
+        old version and never served; the Speakers themselves are fetched
+        in a single batch.
+        """
+        ctx = ndb.get_context()
+        memcache_key = MEMCACHE_CONF_SPEAKERS_KEY % c_key.urlsafe()
+        resource = versions.conferenceSessions(c_key)
+        # both reads go out in a single memcache batch
+        version, cached = yield (
+            ctx.memcache_get(versions.versionKey(resource)),
+            ctx.memcache_get(memcache_key))
+        version = versions.getVersion(resource, version)
+        if cached and cached[0] == version:
+            s_keys = cached[1]
+        else:
+            # Projection query reads only the speakerKey index entries
+            sessions = yield Session.query(
+                ancestor=c_key, projection=[Session.speakerKey],
+                distinct=True).fetch_async()
+            s_keys = sorted(set(sesh.speakerKey[0] for sesh in sessions))
+            yield ctx.memcache_set(memcache_key, (version, s_keys))
+        speakers = yield ndb.get_multi_async(s_keys)
+        # Skip any Speakers that have since been deleted
+        raise ndb.Return([spkr for spkr in speakers if spkr])
 
 
 # - - - wishList methods - - - - - - - - - - - - - - - - - - -
 
-    def _sessionWishlist(self, request, add=True):
-        """Add or remove a session to a User's wishlist."""
-        retval = None
+    def _sessionWishlist(self, wssks, add=True, strict=True):
+        """Add or remove sessions to a User's wishlist.
+
+        With strict, adding a session already in the wishlist is an error;
+        otherwise sessions already (or not) in the wishlist are skipped.
+        Returns True if the wishlist changed.
+        """
         # Ensure that user is authed
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('Authorization Required')
-        # Get user's profile
-        prof = self._getProfileFromUser()
-        # Get Session being passed
-        try:
-            sesh_key = ndb.Key(urlsafe=request.webSafeSeshKey)
-        except Exception:
-            raise endpoints.BadRequestException(
-                'The websafeSessionKey given is invalid.')
-        session = sesh_key.get()
-        # Throw Not Found Error if no Session found
-        if not sesh_key:
-            raise endpoints.NotFoundException(
-                'No session found with key: {0}'.format(sesh_key))
-        # Get Session parent key and associated Conference
-        conference = session.key.parent().get()
-        conf_key = conference.key.urlsafe()
-        # Ensure that conference is in User's conferenceKeysToAttend
-        if conf_key not in prof.conferenceKeysToAttend:
+        # Get user's profile; it is rewritten below
+        prof = self._getProfileFromUser(forUpdate=True)
+        # Get Sessions being passed
+        sesh_keys = []
+        for wssk in wssks:
+            try:
+                sesh_keys.append(ndb.Key(urlsafe=wssk))
+            except Exception:
+                raise endpoints.BadRequestException(
+                    'The websafeSessionKey given is invalid: %s' % wssk)
+        # Throw Not Found Error if any Session isn't found; all of them are
+        # fetched in a single batch
+        for wssk, session in zip(wssks, ndb.get_multi(sesh_keys)):
+            if not session:
+                raise endpoints.NotFoundException(
+                    'No session found with key: {0}'.format(wssk))
+        # Ensure that the User is registered for each Session's parent
+        # conference, which is simply the Session key's parent
+        c_keys = set(sesh_key.parent() for sesh_key in sesh_keys)
+        if self._getRegisteredConferenceKeys(prof, c_keys) != c_keys:
             raise ConflictException(
                 "You must be register for the parent confernce before adding "
                 "a session to your wishlist.")
+        # Use a set for membership checks, keeping the stored list's order
+        wishlist = set(prof.sessionWishList)
+        size = len(prof.sessionWishList)
         if add:
-            # Check if session is already in wishlist
-            if request.webSafeSeshKey in prof.sessionWishList:
+            if strict and wishlist.intersection(sesh_keys):
                 raise ConflictException(
                     "This Session is already in your wishlist.")
-            # Add session to User's wishlist
-            prof.sessionWishList.append(request.webSafeSeshKey)
-            retval = True
+            for sesh_key in sesh_keys:
+                if sesh_key not in wishlist:
+                    # Add session to User's wishlist
+                    prof.sessionWishList.append(sesh_key)
+                    wishlist.add(sesh_key)
         else:
-            # Check if session is already in wishlist
-            if request.webSafeSeshKey in prof.sessionWishList:
-                # Remove Session from User's wishlist
-                prof.sessionWishList.remove(request.webSafeSeshKey)
-                retval = True
-            else:
-                retval = False
-        prof.put()
-        return BooleanMessage(data=retval)
+            # Remove Sessions from User's wishlist
+            removed = wishlist.intersection(sesh_keys)
+            prof.sessionWishList = [sesh_key for sesh_key
+                                    in prof.sessionWishList
+                                    if sesh_key not in removed]
+        # Only rewrite the Profile if the wishlist actually changed
+        changed = len(prof.sessionWishList) != size
+        if changed:
+            prof.put()
+        return changed
 
     @endpoints.method(message_types.VoidMessage, SessionForms,
                       path        = 'view/session_wishlist',
@@ -275,13 +405,37 @@ class ConferenceApi(remote.Service):
         """Get list of sessions in the current user's wishlist."""
         # Get user's profile
         prof = self._getProfileFromUser()
-        sesh_keys = [ndb.Key(urlsafe=wssk) for wssk in
-                     prof.sessionWishList]
-        sessions = ndb.get_multi(sesh_keys)
+        sessions = [sesh for sesh in ndb.get_multi(prof.sessionWishList)
+                    if sesh]
         # return set of SessionForm objects per Session
-        return SessionForms(
-            items=[self._copyConferenceSessionToForm(
-                sesh) for sesh in sessions])
+        return self._copyConferenceSessionsToForms(sessions)
+
+    @endpoints.method(SEARCH_REQUEST, SessionForms,
+                      path        = 'searchSessions',
+                      http_method = 'GET',
+                      name        = 'searchSessions')
+    def searchSessions(self, request):
+        """Search sessions by words in their name or highlights, optionally
+        within one conference (by websafeConferenceKey).
+        """
+        wsck = request.websafeConferenceKey
+        if wsck:
+            # the key ends up in the query string, so only a real
+            # Conference key, in its canonical form, is let through
+            try:
+                c_key = ndb.Key(urlsafe=wsck)
+            except Exception:
+                raise endpoints.BadRequestException(
+                    'The websafeConferenceKey given is invalid.')
+            if c_key.kind() != 'Conference':
+                raise endpoints.BadRequestException(
+                    'The websafeConferenceKey given is invalid.')
+            wsck = c_key.urlsafe()
+        sessions, next_cursor = self._search(
+            request, searchindex.searchSessions, websafeConferenceKey=wsck)
+        forms = self._copyConferenceSessionsToForms(sessions)
+        forms.websafeCursor = next_cursor
+        return forms
 
     @endpoints.method(SESH_POST_REQUEST, BooleanMessage,
                       path        = 'sessionToWishlist/{webSafeSeshKey}',
@@ -289,7 +443,8 @@ class ConferenceApi(remote.Service):
                       name        = 'addSessionToWishlist')
     def addSessionToWishlist(self, request):
         """Add a session to the User's wishlist."""
-        return self._sessionWishlist(request)
+        self._sessionWishlist([request.webSafeSeshKey])
+        return BooleanMessage(data=True)
 
     @endpoints.method(SESH_POST_REQUEST, BooleanMessage,
                       path        = 'removeSessionFromWishlist/'
@@ -298,33 +453,41 @@ class ConferenceApi(remote.Service):
                       name        = 'removeSessionFromWishlist')
     def removeSessionFromWishlist(self, request):
         """Remove a session from the User's wishlist."""
-        return self._sessionWishlist(request, add=False)
+        return BooleanMessage(data=self._sessionWishlist(
+            [request.webSafeSeshKey], add=False))
+
+    @endpoints.method(SessionKeysForm, BooleanMessage,
+                      path        = 'sessionsToWishlist',
+                      http_method = 'POST',
+                      name        = 'addSessionsToWishlist')
+    def addSessionsToWishlist(self, request):
+        """Add several sessions to the User's wishlist, skipping any that
+        are already in it.
+        """
+        return BooleanMessage(data=self._sessionWishlist(
+            request.websafeSessionKeys, strict=False))
+
+    @endpoints.method(SessionKeysForm, BooleanMessage,
+                      path        = 'removeSessionsFromWishlist',
+                      http_method = 'POST',
+                      name        = 'removeSessionsFromWishlist')
+    def removeSessionsFromWishlist(self, request):
+        """Remove several sessions from the User's wishlist."""
+        return BooleanMessage(data=self._sessionWishlist(
+            request.websafeSessionKeys, add=False))
 
 
 # - - - Session objects - - - - - - - - - - - - - - - - -
 
-    def _copyConferenceSessionToForm(self, sesh):
-        """Copy relevant fields from Session to SessionForm."""
-        sf = SessionForm()
-        for field in sf.all_fields():
-            if hasattr(sesh, field.name):
-                # Convert date and startTime fields to strings
-                if field.name == 'date' or field.name == 'startTime':
-                    setattr(sf, field.name, str(getattr(sesh, field.name)))
-                # Convert typeOfSession to enum
-                elif field.name == 'typeOfSession':
-                    setattr(sf, field.name, getattr(SessionType,
-                                                    getattr(sesh, field.name)))
-                # Just copy over the remaining fields
-                else:
-                    setattr(sf, field.name, getattr(sesh, field.name))
-            # Convert Datastore keys in to URL compatible strings
-            elif field.name == 'parentConfKey' or field.name == 'speakerKey':
-                setattr(sf, field.name, sesh.key.urlsafe())
-        sf.check_initialized()
-        return sf
-
-    @endpoints.method(CONF_GET_REQUEST, SessionForms,
+    def _copyConferenceSessionsToForms(self, sessions, fields=None):
+        """Copy relevant fields from Sessions to SessionForms."""
+        # The converter turns date and startTime into strings and
+        # typeOfSession into its enum
+        return SessionForms(
+            items = converters.copyAllToForms(
+                list(sessions), SessionForm, fields))
+
+    @endpoints.method(SESH_GET_REQUEST, SessionForms,
                       path        = 'sessions/{websafeConferenceKey}',
                       http_method = 'GET',
                       name        = 'getSessionsByConference')
@@ -340,18 +503,34 @@ class ConferenceApi(remote.Service):
         except Exception:
             raise endpoints.BadRequestException(
                 'The websafeConferenceKey given is invalid.')
+        # Answer "not modified" if the client already has this version; the
+        # version is read before the Sessions so it is never newer than them
+        version = versions.getVersion(versions.conferenceSessions(c_key))
+        # a summary carries fewer fields than the full listing of the same
+        # Sessions, so the two are told apart by their stamps
+        if request.summary:
+            version += '.summary'
+        if request.version == version:
+            return SessionForms(version=version, notModified=True)
+        # Look up the Conference and its Sessions at the same time; a
+        # summary only reads the summary properties from the index
+        conf_future = c_key.get_async()
+        if request.summary:
+            sessions_future = Session.query(ancestor=c_key).fetch_async(
+                projection=[Session.name, Session.date, Session.startTime])
+        else:
+            sessions_future = Session.query(ancestor=c_key).fetch_async()
         # Verify that the Conference exists
-        conf = c_key.get()
-        if not conf:
+        if not conf_future.get_result():
             raise endpoints.NotFoundException(
                 'No conference found for the key provided: %s'
                 % request.websafeConferenceKey)
-        # Store the Sessions that are ancestors of the Conference
-        sessions = Session.query(ancestor=c_key)
+        sessions = sessions_future.get_result()
         # Return a SessionForm for each Session
-        return SessionForms(
-            items = [self._copyConferenceSessionToForm(
-                sesh) for sesh in sessions])
+        forms = self._copyConferenceSessionsToForms(
+            sessions, SESH_SUMMARY_FIELDS if request.summary else None)
+        forms.version = version
+        return forms
 
     @endpoints.method(SESH_BY_TYPE_GET_REQUEST, SessionForms,
                       path        = 'getConfSessionsByType/'
@@ -371,9 +550,12 @@ class ConferenceApi(remote.Service):
         sessions = sessions.filter(
             Session.typeOfSession == request.typeOfSession)
         # Return a SessionForm for each Session
-        return SessionForms(
-            items = [self._copyConferenceSessionToForm(
-                sesh) for sesh in sessions])
+        if request.summary:
+            return self._copyConferenceSessionsToForms(
+                sessions.fetch(projection=[
+                    Session.name, Session.date, Session.startTime]),
+                SESH_SUMMARY_FIELDS)
+        return self._copyConferenceSessionsToForms(sessions)
 
     @endpoints.method(SESH_BY_DATE_GET_REQUEST, SessionForms,
                       path        = 'getConfSessionsByDate/'
@@ -394,9 +576,16 @@ class ConferenceApi(remote.Service):
         # Filter remaining Sessions by date
         sessions = sessions.filter(Session.date == date)
         # Return a SessionForm for each Session
-        return SessionForms(
-            items = [self._copyConferenceSessionToForm(
-                sesh) for sesh in sessions])
+        if request.summary:
+            # date has an equality filter so can't be projected; every
+            # Session has the date requested anyway
+            forms = self._copyConferenceSessionsToForms(
+                sessions.fetch(projection=[Session.name, Session.startTime]),
+                [field for field in SESH_SUMMARY_FIELDS if field != 'date'])
+            for sf in forms.items:
+                sf.date = str(date)
+            return forms
+        return self._copyConferenceSessionsToForms(sessions)
 
     # Implementation of Task 3 challenge
     @endpoints.method(SESH_BY_TIME_AND_TYPE_GET_REQUEST, SessionForms,
@@ -417,74 +606,133 @@ class ConferenceApi(remote.Service):
             ancestor=ndb.Key(urlsafe=request.websafeConferenceKey))
         # convert the time string passed to time() object
         lastTime = datetime.strptime(request.noLaterThen[:5], "%H:%M").time()
-        # Retrieve Sessions that start on or before the noLaterThen time
+        # Let the datastore apply the only inequality it can serve from the
+        # (ancestor, startTime) index: sessions on or before noLaterThen
         timeSessions = confSessions.filter(Session.startTime <= lastTime)
-        # Store a list of the Keys that meet the time criteria
-        timeKeys = [sesh.key for sesh in timeSessions]
-        # Retrieve Sessions that are not of the typeOfSession passed in
-        typeSessions = confSessions.filter(
-            Session.typeOfSession != request.typeOfSession)
-        # filter typeSessions by timeSession Keys
-        sessions = typeSessions.filter(Session.key.IN(timeKeys))
+        # Exclude the typeOfSession passed in while streaming the results,
+        # rather than issuing a second != query joined on keys
+        if request.summary:
+            timeSessions = timeSessions.iter(batch_size=100, projection=[
+                Session.startTime, Session.name, Session.date,
+                Session.typeOfSession])
+        else:
+            timeSessions = timeSessions.iter(batch_size=100)
+        sessions = (sesh for sesh in timeSessions
+                    if sesh.typeOfSession != request.typeOfSession)
         # Return a SessionForm for each Session
-        return SessionForms(
-            items = [self._copyConferenceSessionToForm(
-                sesh) for sesh in sessions])
+        return self._copyConferenceSessionsToForms(
+            sessions, SESH_SUMMARY_FIELDS if request.summary else None)
 
     @endpoints.method(SESH_BY_SPEAKER_GET_REQUEST, SessionForms,
                       path        = 'getSessionsBySpeaker/{speakerKey}',
                       http_method = 'GET',
                       name        = 'getSessionsBySpeaker')
     def getSessionsBySpeaker(self, request):
-        """Given a Speaker, return all sessions with that Speaker, regardless
-        of Conference.
+        """Given a Speaker, return a page of the sessions with that Speaker,
+        by date, optionally within one conference or a date range.
         """
         # Ensure that user is authed
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('Authorization Required')
-        # Filter Sessions by Speaker key
-        sessions = Session.query(Session.speakerKey == request.speakerKey)
-        # Return a SessionForm for each Session
-        return SessionForms(
-            items = [self._copyConferenceSessionToForm(
-                sesh) for sesh in sessions])
-
-    def _createSessionObject(self, request):
-        """Create a Session object, returning SessionForm/request."""
-        # Ensure that the current user is logged in and get user ID
-        user = endpoints.get_current_user()
-        if not user:
-            raise endpoints.UnauthorizedException('Authorization required')
-        user_id = getUserId(user)
-        # Verify that a name and parentConfKey were provided for the Session
-        if not request.name and request.parentConfKey:
+        try:
+            s_key = ndb.Key(urlsafe=request.speakerKey)
+        except Exception:
             raise endpoints.BadRequestException(
-                "Session 'name' and 'parentConfKey' are required fields.")
-        # Attempt to retrieve the Conference details using the Confernce key
+                'The speakerKey given is invalid.')
+        page_size = request.pageSize or SPEAKER_SESSIONS_PAGE_SIZE
+        if page_size < 1 or page_size > SPEAKER_SESSIONS_MAX_PAGE_SIZE:
+            raise endpoints.BadRequestException(
+                'pageSize must be between 1 and %d.'
+                % SPEAKER_SESSIONS_MAX_PAGE_SIZE)
+        # The first unfiltered page of default size is cached
+        first_page = not (request.websafeConferenceKey or request.startDate
+                          or request.endDate or request.websafeCursor
+                          or request.pageSize)
+        if first_page:
+            cached = memcache.get(
+                MEMCACHE_SPEAKER_SESSIONS_KEY % request.speakerKey)
+            if cached is not None:
+                return protobuf.decode_message(SessionForms, cached)
+        # Read a page of the Speaker's own index of Sessions; its entries
+        # are keyed by the Sessions' keys
+        query = SpeakerSession.query(ancestor=s_key)
         try:
-            c_key = ndb.Key(urlsafe=request.parentConfKey)
+            if request.websafeConferenceKey:
+                c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+                query = query.filter(SpeakerSession.conferenceKey == c_key)
+            if request.startDate:
+                query = query.filter(SpeakerSession.date >= datetime.strptime(
+                    request.startDate[:10], "%Y-%m-%d").date())
+            if request.endDate:
+                query = query.filter(SpeakerSession.date <= datetime.strptime(
+                    request.endDate[:10], "%Y-%m-%d").date())
+            cursor = None
+            if request.websafeCursor:
+                cursor = ndb.Cursor(urlsafe=request.websafeCursor)
         except Exception:
             raise endpoints.BadRequestException(
-                'The parentConfKey given is invalid.')
-        conf = c_key.get()
-        # Verify that the current user created the conference
-        if user_id != conf.organizerUserId:
-            raise endpoints.ForbiddenException(
-                'Only the conference creator can add a session to it.')
-        # Verify the the speakerKeys provided are valid and store in speakers
-        speakers = []
-        if request.speakerKey:
-            for speakerKey in request.speakerKey:
-                try:
-                    speaker = ndb.Key(urlsafe=speakerKey).get()
-                    speakers.append(speaker)
-                except Exception:
-                    raise endpoints.BadRequestException(
-                        'speakerKey {0} is invalid.'.format(speakerKey))
+                'The websafeConferenceKey, date or websafeCursor given is '
+                'invalid.')
+        entry_keys, next_cursor, more = query.order(
+            SpeakerSession.date).fetch_page(page_size, start_cursor=cursor,
+                                            keys_only=True)
+        sessions = [sesh for sesh in ndb.get_multi(
+            [ndb.Key(urlsafe=entry_key.id()) for entry_key in entry_keys])
+            if sesh]
+        # Return a SessionForm for each Session
+        forms = self._copyConferenceSessionsToForms(sessions)
+        forms.websafeCursor = next_cursor.urlsafe() if more else None
+        if first_page:
+            memcache.set(MEMCACHE_SPEAKER_SESSIONS_KEY % request.speakerKey,
+                         protobuf.encode_message(forms))
+        return forms
+
+    @staticmethod
+    def _putSpeakerSessions(sessions):
+        """Add sessions to their Speakers' indexes of Sessions."""
+        entries = []
+        s_keys = set()
+        for sesh in sessions:
+            for s_key in set(sesh.speakerKey):
+                s_keys.add(s_key)
+                entries.append(SpeakerSession(
+                    key           = ndb.Key(SpeakerSession,
+                                            sesh.key.urlsafe(),
+                                            parent=s_key),
+                    conferenceKey = sesh.key.parent(),
+                    date          = sesh.date))
+        for i in range(0, len(entries), BULK_PUT_CHUNK_SIZE):
+            ndb.put_multi(entries[i:i + BULK_PUT_CHUNK_SIZE])
+        # The Speakers' cached first pages are out of date
+        memcache.delete_multi([MEMCACHE_SPEAKER_SESSIONS_KEY % s_key.urlsafe()
+                               for s_key in s_keys])
+
+    def _getSessionSpeakers(self, wssks):
+        """Validate websafe speaker keys, fetching the Speakers in one batch.
+        """
+        s_keys = []
+        for wssk in wssks:
+            try:
+                s_keys.append(ndb.Key(urlsafe=wssk))
+            except Exception:
+                raise endpoints.BadRequestException(
+                    'speakerKey {0} is invalid.'.format(wssk))
+        speakers = ndb.get_multi(s_keys)
+        for wssk, speaker in zip(wssks, speakers):
+            if not speaker:
+                raise endpoints.BadRequestException(
+                    'speakerKey {0} is invalid.'.format(wssk))
+        return speakers
+
+    def _copySessionFormToData(self, request, conf):
+        """Copy a SessionForm into a dict of Session properties, filling in
+        defaults on both.
+        """
         # Copy SessionForm/ProtoRPC Message into dict
         data = ({field.name: getattr(request, field.name)
                 for field in request.all_fields()})
+        del data['websafeKey']
         # If values not given for Session defaults, add defaults
         for df in SESH_DEFAULTS:
             if data[df] in (None, []):
@@ -505,47 +753,104 @@ class ConferenceApi(remote.Service):
         # Convert typeOfSession Enum to string
         if data['typeOfSession']:
             data['typeOfSession'] = str(data['typeOfSession'])
+        # Store typed keys; the speakerKeys have already been verified
+        data['speakerKey'] = [ndb.Key(urlsafe=wssk)
+                              for wssk in data['speakerKey']]
+        data['parentConfKey'] = conf.key
+        return data
+
+    def _createSessionObject(self, request):
+        """Create a Session object, returning SessionForm/request."""
+        # Ensure that the current user is logged in and get user ID
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+        # Verify that a name and parentConfKey were provided for the Session
+        if not request.name and request.parentConfKey:
+            raise endpoints.BadRequestException(
+                "Session 'name' and 'parentConfKey' are required fields.")
+        # Attempt to retrieve the Conference details using the Confernce key
+        try:
+            c_key = ndb.Key(urlsafe=request.parentConfKey)
+        except Exception:
+            raise endpoints.BadRequestException(
+                'The parentConfKey given is invalid.')
+        # Fetch the Conference while the speakerKeys are being verified
+        conf_future = c_key.get_async()
+        # Verify the the speakerKeys provided are valid
+        self._getSessionSpeakers(request.speakerKey)
+        conf = conf_future.get_result()
+        # Verify that the current user created the conference
+        if user_id != conf.organizerUserId:
+            raise endpoints.ForbiddenException(
+                'Only the conference creator can add a session to it.')
+        data = self._copySessionFormToData(request, conf)
         # Create a key for the Session
         s_id  = Session.allocate_ids(size=1, parent=c_key)[0]
         s_key = ndb.Key(Session, s_id, parent=c_key)
         # Update stored session with session keys
         data['key'] = s_key
-        # Check that speakerKeys were passed with request
-        if speakers:
-            # Adding checks here to prevent task creation if not needed
-            # TODO Is it better to perform these checks here or
-            # in _cacheFeaturedSpeaker?
-            s = Session.query(
-                ancestor=ndb.Key(urlsafe=request.parentConfKey))
-            # Determine which Speaker is associated with the most Sessions
-            featured = None
-            minSessions = 0
-            for spkr in data['speakerKey']:
-                count = s.filter(Session.speakerKey == spkr).count()
-                if count >= minSessions:
-                    featured = spkr
-                    minSessions = count
-            # If a speaker is associated with more than 1 Session, add them as
-            # the featured speaker
-            if featured:
-                taskqueue.add(
-                    params = {
-                        'websafeConferenceKey': request.parentConfKey,
-                        'websafeSpeakerKey'   : featured},
-                    url    = '/tasks/set_featured_speaker',
-                    method = 'GET')
-        # Store the created Session in the datastore
-        Session(**data).put()
+        # Store the created Session in the datastore along with its
+        # speakers' running session counts for the conference
+        sesh = Session(**data)
+        counts = self._putSessionWithSpeakerCounts(sesh)
+        self._putSpeakerSessions([sesh])
+        searchindex.indexSessions([sesh])
+        # If a speaker now has enough Sessions to be featured, let the task
+        # pick the conference's top speaker from the counts
+        if any(count.sessionCount >= FEATURED_SPEAKER_MIN_SESSIONS
+               for count in counts):
+            taskqueue.add(
+                params = {'websafeConferenceKey': c_key.urlsafe()},
+                url    = '/tasks/set_featured_speaker',
+                method = 'GET')
+        # The conference's speaker set and session list have changed
+        versions.bumpVersion(versions.conferenceSessions(c_key))
         # Send an email to the conference organizer
-        taskqueue.add(
-            params = {
-                'email'   : user.email(),
-                'subject' : 'You Created a New Session for %s!' % conf.name,
-                'body'    : 'Here are the details for your session:',
-                'info'    : repr(request)},
-            url    = '/tasks/send_confirmation_email')
+        outbox.queueEmail(
+            email   = user.email(),
+            subject = 'You Created a New Session for %s!' % conf.name,
+            body    = 'Here are the details for your session:',
+            info    = repr(request))
         return request
 
+    @staticmethod
+    def _incrementSpeakerCounts(c_key, wssks):
+        """Return c_key's SpeakerCounts for wssks, bumped once for every
+        occurrence of a speaker in wssks.  The caller stores them.
+        """
+        tally = Counter(wssks)
+        count_keys = [ndb.Key(SpeakerCount, wssk, parent=c_key)
+                      for wssk in sorted(tally)]
+        counts = [count or SpeakerCount(key=key) for key, count in
+                  zip(count_keys, ndb.get_multi(count_keys))]
+        for count in counts:
+            count.sessionCount += tally[count.key.id()]
+        return counts
+
+    @staticmethod
+    @ndb.transactional()
+    def _putSessionWithSpeakerCounts(sesh):
+        """Store a Session and bump its speakers' SpeakerCounts.
+
+        Both live in the Conference's entity group, so one transaction keeps
+        the counts exact without reading any other Sessions.
+        """
+        wssks = set(s_key.urlsafe() for s_key in sesh.speakerKey)
+        counts = ConferenceApi._incrementSpeakerCounts(
+            sesh.key.parent(), wssks)
+        ndb.put_multi([sesh] + counts)
+        return counts
+
+    @staticmethod
+    @ndb.transactional()
+    def _putSpeakerCounts(c_key, wssks):
+        """Bump and store c_key's SpeakerCounts in one transaction."""
+        counts = ConferenceApi._incrementSpeakerCounts(c_key, wssks)
+        ndb.put_multi(counts)
+        return counts
+
     @endpoints.method(SessionForm, SessionForm,
                       path        = 'sessions',
                       http_method = 'POST',
@@ -554,41 +859,143 @@ class ConferenceApi(remote.Service):
         """Create a new Session."""
         return self._createSessionObject(request)
 
+    @endpoints.method(SessionForms, SessionForms,
+                      path        = 'sessions/bulk',
+                      http_method = 'POST',
+                      name        = 'createSessionsBulk')
+    def createSessionsBulk(self, request):
+        """Create many Sessions at once, e.g. to import a schedule."""
+        # Ensure that the current user is logged in and get user ID
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+        if len(request.items) > BULK_MAX_SESSIONS:
+            raise endpoints.BadRequestException(
+                'At most %d sessions can be created at once.'
+                % BULK_MAX_SESSIONS)
+        # Verify that every Session names an existing parent Conference
+        for sf in request.items:
+            if not sf.name or not sf.parentConfKey:
+                raise endpoints.BadRequestException(
+                    "Session 'name' and 'parentConfKey' are required fields.")
+        try:
+            c_keys = dict((wsck, ndb.Key(urlsafe=wsck)) for wsck in
+                          set(sf.parentConfKey for sf in request.items))
+        except Exception:
+            raise endpoints.BadRequestException(
+                'A parentConfKey given is invalid.')
+        # Fetch every Conference and Speaker involved in one batch each
+        confs = dict(zip(c_keys, ndb.get_multi(c_keys.values())))
+        for wsck, conf in confs.items():
+            if not conf:
+                raise endpoints.NotFoundException(
+                    'No conference found with key: %s' % wsck)
+            # Verify that the current user created the conference
+            if user_id != conf.organizerUserId:
+                raise endpoints.ForbiddenException(
+                    'Only the conference creator can add a session to it.')
+        self._getSessionSpeakers(sorted(set(
+            wssk for sf in request.items for wssk in sf.speakerKey)))
+        # Group the Sessions by Conference, allocating their ids in one
+        # range per Conference
+        sessions = []
+        wssks = {}
+        for wsck, c_key in c_keys.items():
+            forms = [sf for sf in request.items if sf.parentConfKey == wsck]
+            first, last = Session.allocate_ids(size=len(forms), parent=c_key)
+            for s_id, sf in zip(range(first, last + 1), forms):
+                data = self._copySessionFormToData(sf, confs[wsck])
+                data['key'] = ndb.Key(Session, s_id, parent=c_key)
+                sessions.append(Session(**data))
+                wssks.setdefault(wsck, []).extend(set(sf.speakerKey))
+        # Store the Sessions in chunks
+        for i in range(0, len(sessions), BULK_PUT_CHUNK_SIZE):
+            ndb.put_multi(sessions[i:i + BULK_PUT_CHUNK_SIZE])
+        self._putSpeakerSessions(sessions)
+        searchindex.indexSessions(sessions)
+        # Bump the speakers' session counts, once per Conference, and queue
+        # the featured speaker recomputes together
+        tasks = []
+        for wsck, c_key in c_keys.items():
+            # retires the cached session list and speaker set
+            versions.bumpVersion(versions.conferenceSessions(c_key))
+            counts = self._putSpeakerCounts(c_key, wssks.get(wsck, []))
+            if any(count.sessionCount >= FEATURED_SPEAKER_MIN_SESSIONS
+                   for count in counts):
+                tasks.append(taskqueue.Task(
+                    params = {'websafeConferenceKey': c_key.urlsafe()},
+                    url    = '/tasks/set_featured_speaker',
+                    method = 'GET'))
+        # Queue.add takes a limited number of tasks per call
+        for i in range(0, len(tasks), taskqueue.MAX_TASKS_PER_ADD):
+            taskqueue.Queue().add(tasks[i:i + taskqueue.MAX_TASKS_PER_ADD])
+        if sessions:
+            outbox.queueEmail(
+                email   = user.email(),
+                subject = 'You Created %d New Sessions!' % len(sessions),
+                body    = 'Here are the sessions you created:',
+                info    = '\r\n'.join(
+                    '%s (%s)' % (sesh.name,
+                                 confs[sesh.parentConfKey.urlsafe()].name)
+                    for sesh in sessions))
+        return request
+
 
 # - - - Conference objects - - - - - - - - - - - - - - - - -
 
-    def _copyConferenceToForm(self, conf, displayName):
+    def _copyConferenceToForm(self, conf, seatsAvailable=None):
         """Copy relevant fields from Conference to ConferenceForm."""
-        cf = ConferenceForm()
-        for field in cf.all_fields():
-            if hasattr(conf, field.name):
-                # convert Date to date string; just copy others
-                if field.name.endswith('Date'):
-                    setattr(cf, field.name, str(getattr(conf, field.name)))
-                else:
-                    setattr(cf, field.name, getattr(conf, field.name))
-            elif field.name == "websafeKey":
-                setattr(cf, field.name, conf.key.urlsafe())
-        if displayName:
-            setattr(cf, 'organizerDisplayName', displayName)
+        # the converter turns Dates into date strings and adds websafeKey
+        cf = converters.copyToForm(conf, ConferenceForm)
+        # seats are tracked by the sharded seat counter, not the entity
+        if seatsAvailable is None:
+            seatsAvailable = seats.getSeatsAvailable(conf)
+        cf.seatsAvailable = seatsAvailable
         cf.check_initialized()
         return cf
 
-    @endpoints.method(CONF_GET_REQUEST, ConferenceForm,
+    @staticmethod
+    def _fillOrganizerDisplayNames(confs):
+        """Fill in organizerDisplayName on Conferences stored without it.
+
+        Only Conferences created before the name was denormalized need
+        their organizer's Profile, which is fetched in a single batch.
+        """
+        missing = [conf for conf in confs if conf.organizerDisplayName is None]
+        if missing:
+            profiles = ndb.get_multi([ndb.Key(Profile, conf.organizerUserId)
+                                      for conf in missing])
+            for conf, prof in zip(missing, profiles):
+                conf.organizerDisplayName = getattr(prof, 'displayName', None)
+
+    @endpoints.method(CONF_VERSIONED_GET_REQUEST, ConferenceForm,
                       path        = 'conference/{websafeConferenceKey}',
                       http_method = 'GET',
                       name        = 'getConference')
     def getConference(self, request):
         """Return requested conference (by websafeConferenceKey)."""
-        # get Conference object from request; bail if not found
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
+        c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+        # Answer "not modified" if the client already has this version
+        version = versions.getVersion(versions.conference(c_key))
+        if request.version == version:
+            return ConferenceForm(websafeKey  = request.websafeConferenceKey,
+                                  version     = version,
+                                  notModified = True)
+        # get Conference object from request; bail if not found.  The
+        # version is shared by every instance, so the Conference is read
+        # through ndb rather than the instance cache, which may hold an
+        # older copy than the version stamps
+        conf = c_key.get()
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s'
                 % request.websafeConferenceKey)
-        prof = conf.key.parent().get()
+        self._fillOrganizerDisplayNames([conf])
         # return ConferenceForm
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        cf = self._copyConferenceToForm(conf)
+        cf.version = version
+        return cf
 
     def _createConferenceObject(self, request):
         """Create a Conference object, returning ConferenceForm/request."""
@@ -603,8 +1010,10 @@ class ConferenceApi(remote.Service):
         # copy ConferenceForm/ProtoRPC Message into dict
         data = ({field.name: getattr(request, field.name)
                 for field in request.all_fields()})
+        # outbound-only fields have no Conference property
         del data['websafeKey']
-        del data['organizerDisplayName']
+        del data['version']
+        del data['notModified']
         # add default values for those missing
         # (both data model & outbound Message)
         for df in CONF_DEFAULTS:
@@ -624,9 +1033,10 @@ class ConferenceApi(remote.Service):
             data['endDate'] = (
                 datetime.strptime(data['endDate'][:10], "%Y-%m-%d").date()
             )
-        # set seatsAvailable to be same as maxAttendees on creation
-        if data["maxAttendees"] > 0:
-            data["seatsAvailable"] = data["maxAttendees"]
+        # every seat is available on creation; the seat counter keeps the
+        # count from now on, so the legacy seatsAvailable is left unset
+        request.seatsAvailable = max(data["maxAttendees"], 0)
+        data["seatsAvailable"] = None
         # generate Profile Key based on user ID and Conference
         # ID based on Profile key get Conference key from ID
         p_key = ndb.Key(Profile, user_id)
@@ -635,16 +1045,20 @@ class ConferenceApi(remote.Service):
         # Update stored conference with profile and conference keys
         data['key']             = c_key
         data['organizerUserId'] = request.organizerUserId = user_id
+        # Store the organizer's name with the conference for listings;
+        # it is written, so the Profile is read past the instance cache
+        data['organizerDisplayName'] = request.organizerDisplayName = (
+            self._getProfileFromUser(forUpdate=True).displayName)
         # create Conference, send email to organizer confirming
         # creation of Conference & return (modified) ConferenceForm
-        Conference(**data).put()
-        taskqueue.add(
-            params = {
-                'email'   : user.email(),
-                'subject' : 'You Created a New Conference!',
-                'body'    : 'Here are the details for your conference:',
-                'info'    : repr(request)},
-            url    = '/tasks/send_confirmation_email')
+        conf = Conference(**data)
+        conf.put()
+        searchindex.indexConferences([conf])
+        outbox.queueEmail(
+            email   = user.email(),
+            subject = 'You Created a New Conference!',
+            body    = 'Here are the details for your conference:',
+            info    = repr(request))
         return request
 
     @endpoints.method(ConferenceForm, ConferenceForm,
@@ -655,19 +1069,11 @@ class ConferenceApi(remote.Service):
         """Create new conference."""
         return self._createConferenceObject(request)
 
-    @ndb.transactional()
-    def _updateConferenceObject(self, request):
-        """Update a Conference object, returning the updated ConferenceForm().
+    @ndb.transactional(xg=True)
+    def _putConferenceUpdate(self, request, user_id):
+        """Copy the fields given in a ConferenceForm onto its Conference,
+        returning the updated Conference.
         """
-        # Get user if logged in, if not throw exception
-        user = endpoints.get_current_user()
-        if not user:
-            raise endpoints.UnauthorizedException('Authorization required')
-        user_id = getUserId(user)
-        # copy ConferenceForm/ProtoRPC Message into dict
-        data = ({field.name: getattr(request, field.name)
-                for field in request.all_fields()}
-                )
         # update existing conference
         conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
         # check that conference exists
@@ -680,9 +1086,18 @@ class ConferenceApi(remote.Service):
             raise endpoints.ForbiddenException(
                 'Only the owner can update the conference.')
         # Not getting all the fields, so don't create a new object; just
-        # copy relevant fields from ConferenceForm to Conference object
+        # copy relevant fields from ConferenceForm to Conference object;
+        # the legacy seat count only holds for the current maxAttendees,
+        # so it is copied into the seat shards first
+        seats.seedShards(conf)
         for field in request.all_fields():
             data = getattr(request, field.name)
+            # seats are managed by the seat counter and the organizer's
+            # name by their Profile, never copy them over, nor the
+            # outbound-only fields
+            if field.name in ('seatsAvailable', 'organizerDisplayName',
+                              'websafeKey', 'version', 'notModified'):
+                continue
             # only copy fields where we get data
             if data not in (None, []):
                 # special handling for dates (convert string to Date)
@@ -693,8 +1108,28 @@ class ConferenceApi(remote.Service):
                 # write to Conference object
                 setattr(conf, field.name, data)
         conf.put()
-        prof = ndb.Key(Profile, user_id).get()
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        # a new maxAttendees changes the seats available
+        seats.invalidate(conf.key)
+        return conf
+
+    def _updateConferenceObject(self, request):
+        """Update a Conference object, returning the updated ConferenceForm().
+        """
+        # Get user if logged in, if not throw exception
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+        conf = self._putConferenceUpdate(request, user_id)
+        # The rest touches other entity groups and must see the committed
+        # seat count, so it runs once the update has committed
+        searchindex.indexConferences([conf])
+        versions.bumpVersion(versions.conference(conf.key))
+        # a new maxAttendees may move the conference in or out of the
+        # announcement
+        self._updateNearlySoldOut(conf.key, force=True)
+        self._fillOrganizerDisplayNames([conf])
+        return self._copyConferenceToForm(conf)
 
     def _getQuery(self, request):
         """Return formatted query from the submitted filters."""
@@ -750,23 +1185,125 @@ class ConferenceApi(remote.Service):
                       http_method = 'POST',
                       name        = 'queryConferences')
     def queryConferences(self, request):
-        """Query for conferences."""
-        conferences = self._getQuery(request)
-        # need to fetch organiser displayName from profiles
-        # get all keys and use get_multi for speed
-        organisers = ([(ndb.Key(Profile, conf.organizerUserId)) for conf in
-                      conferences])
-        profiles = ndb.get_multi(organisers)
-        # put display names in a dict for easier fetching
-        names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
+        """Query for conferences, one page at a time."""
+        # Count the query's shape for the index advisor, cached or not,
+        # so the advice reflects every query clients send
+        inequality_field, filters = self._formatFilters(request.filters)
+        indexadvisor.recordQuery(
+            [filtr["field"] for filtr in filters if filtr["operator"] == "="],
+            inequality_field)
+        # Read the cached response along with the conferences' version
+        # stamp; it is only served if no conference changed since it was
+        # built
+        key = MEMCACHE_CONF_QUERY_KEY % self._queryHash(request)
+        version_key = versions.versionKey(versions.CONFERENCES)
+        cached = memcache.get_multi([version_key, key])
+        version = versions.getVersion(versions.CONFERENCES,
+                                      cached.get(version_key))
+        if key in cached and cached[key][0] == version:
+            return protobuf.decode_message(ConferenceForms, cached[key][1])
+        forms = self._queryConferences(request)
+        memcache.set(key, (version, protobuf.encode_message(forms)),
+                     time=QUERY_CACHE_TTL)
+        return forms
+
+    @staticmethod
+    def _queryHash(request):
+        """Return a hash identifying a queryConferences request; filters
+        given in a different order hash the same.
+        """
+        filters = sorted((f.field, f.operator, f.value)
+                         for f in request.filters)
+        return hashlib.sha1(repr((
+            filters, request.pageSize or QUERY_PAGE_SIZE,
+            request.websafeCursor, bool(request.summary)))).hexdigest()
+
+    def _queryConferences(self, request):
+        """Return a page of the conferences matching request."""
+        # Clamp the requested page size to a sane range
+        page_size = request.pageSize or QUERY_PAGE_SIZE
+        if page_size < 1 or page_size > QUERY_MAX_PAGE_SIZE:
+            raise endpoints.BadRequestException(
+                'pageSize must be between 1 and %d.' % QUERY_MAX_PAGE_SIZE)
+        # Decode the opaque cursor handed out with the previous page
+        cursor = None
+        if request.websafeCursor:
+            try:
+                cursor = ndb.Cursor(urlsafe=request.websafeCursor)
+            except Exception:
+                raise endpoints.BadRequestException(
+                    'The websafeCursor given is invalid.')
+        # Fetch a single bounded page in one RPC
+        if request.summary and not request.filters:
+            # unfiltered summaries are read straight from the index
+            conferences, next_cursor, more = self._getQuery(
+                request).fetch_page(page_size, start_cursor=cursor,
+                                    projection=[Conference.name,
+                                                Conference.city,
+                                                Conference.startDate])
+            return ConferenceForms(
+                items         = converters.copyAllToForms(
+                    conferences, ConferenceForm, CONF_SUMMARY_FIELDS),
+                websafeCursor = next_cursor.urlsafe() if more else None,
+                more          = more)
+        conferences, next_cursor, more = self._getQuery(request).fetch_page(
+            page_size, start_cursor=cursor)
+        if request.summary:
+            # filtered properties can't be projected, so trim full entities
+            return ConferenceForms(
+                items         = converters.copyAllToForms(
+                    conferences, ConferenceForm, CONF_SUMMARY_FIELDS),
+                websafeCursor = next_cursor.urlsafe() if more else None,
+                more          = more)
+        self._fillOrganizerDisplayNames(conferences)
+        # look up seat counts for the whole page at once
+        available = seats.getSeatsAvailableMulti(conferences)
         # return individual ConferenceForm object per Conference
         return ConferenceForms(
-            items = [self._copyConferenceToForm(
-                conf, names[conf.organizerUserId]) for conf in conferences])
+            items         = [self._copyConferenceToForm(
+                conf, available[conf.key]) for conf in conferences],
+            websafeCursor = next_cursor.urlsafe() if more else None,
+            more          = more)
 
-    @endpoints.method(message_types.VoidMessage, ConferenceForms,
+    @staticmethod
+    def _search(request, search_func, **kwargs):
+        """Return (entities, next websafe cursor) for a page of search
+        results, best matches first.
+        """
+        page_size = request.pageSize or SEARCH_PAGE_SIZE
+        if page_size < 1 or page_size > SEARCH_MAX_PAGE_SIZE:
+            raise endpoints.BadRequestException(
+                'pageSize must be between 1 and %d.' % SEARCH_MAX_PAGE_SIZE)
+        try:
+            wsks, next_cursor = search_func(
+                request.query, page_size, request.websafeCursor, **kwargs)
+        except search.QueryError:
+            raise endpoints.BadRequestException(
+                'The query or websafeCursor given is invalid.')
+        # documents of deleted entities may linger in the index
+        entities = [entity for entity in ndb.get_multi(
+            [ndb.Key(urlsafe=wsk) for wsk in wsks]) if entity]
+        return entities, next_cursor
+
+    @endpoints.method(SEARCH_REQUEST, ConferenceForms,
+                      path        = 'searchConferences',
+                      http_method = 'GET',
+                      name        = 'searchConferences')
+    def searchConferences(self, request):
+        """Search conferences by words in their name, description, topics
+        or city, one page at a time.
+        """
+        conferences, next_cursor = self._search(
+            request, searchindex.searchConferences)
+        self._fillOrganizerDisplayNames(conferences)
+        available = seats.getSeatsAvailableMulti(conferences)
+        return ConferenceForms(
+            items         = [self._copyConferenceToForm(
+                conf, available[conf.key]) for conf in conferences],
+            websafeCursor = next_cursor,
+            more          = next_cursor is not None)
+
+    @endpoints.method(CONF_CREATED_REQUEST, ConferenceForms,
                       path        = 'getConferencesCreated',
                       http_method = 'POST',
                       name        = 'getConferencesCreated')
@@ -778,12 +1315,21 @@ class ConferenceApi(remote.Service):
             raise endpoints.UnauthorizedException('Authorization required')
         user_id = getUserId(user)
         # create ancestor query for all key matches for this user
-        confs = Conference.query(ancestor=ndb.Key(Profile, user_id))
-        prof = ndb.Key(Profile, user_id).get()
+        query = Conference.query(ancestor=ndb.Key(Profile, user_id))
+        if request.summary:
+            # a summary only reads the summary properties from the index
+            return ConferenceForms(
+                items = converters.copyAllToForms(
+                    query.fetch(projection=[Conference.name, Conference.city,
+                                            Conference.startDate]),
+                    ConferenceForm, CONF_SUMMARY_FIELDS))
+        confs = query.fetch()
+        self._fillOrganizerDisplayNames(confs)
+        available = seats.getSeatsAvailableMulti(confs)
         # return set of ConferenceForm objects per Conference
         return ConferenceForms(
-            items = [self._copyConferenceToForm(
-                conf, getattr(prof, 'displayName')) for conf in confs])
+            items = [self._copyConferenceToForm(conf, available[conf.key])
+                     for conf in confs])
 
 
 # - - - Profile objects - - - - - - - - - - - - - - - - - - -
@@ -791,21 +1337,22 @@ class ConferenceApi(remote.Service):
     def _copyProfileToForm(self, prof):
         """Copy relevant fields from Profile to ProfileForm."""
         # copy relevant fields from Profile to ProfileForm
-        pf = ProfileForm()
-        for field in pf.all_fields():
-            if hasattr(prof, field.name):
-                # convert t-shirt string to Enum; just copy others
-                if field.name == 'teeShirtSize':
-                    setattr(pf, field.name,
-                            getattr(TeeShirtSize, getattr(prof, field.name)))
-                else:
-                    setattr(pf, field.name, getattr(prof, field.name))
+        # the converter turns the t-shirt string into its Enum
+        pf = converters.copyToForm(prof, ProfileForm)
+        # registrations are kept in Registration entities
+        pf.conferenceKeysToAttend = [
+            c_key.urlsafe() for c_key in self._getConferenceKeysToAttend(prof)]
         pf.check_initialized()
         return pf
 
-    def _getProfileFromUser(self):
+    def _getProfileFromUser(self, forUpdate=False):
         """Return user Profile from datastore,
         creating new one if non-existent.
+
+        Callers that change and put() the Profile, or store its fields on
+        other entities, pass forUpdate, so that it is read through ndb
+        instead of the instance cache, whose copy may predate a write made
+        on another instance.
         """
         # make sure user is authed
         user = endpoints.get_current_user()
@@ -814,7 +1361,7 @@ class ConferenceApi(remote.Service):
         # get Profile from datastore
         user_id = getUserId(user)
         p_key = ndb.Key(Profile, user_id)
-        profile = p_key.get()
+        profile = p_key.get() if forUpdate else cache.getEntity(p_key)
         # create new Profile if not there
         if not profile:
             profile = Profile(key          = p_key,
@@ -827,9 +1374,10 @@ class ConferenceApi(remote.Service):
     def _doProfile(self, save_request=None):
         """Get user Profile and return to user, possibly updating it first."""
         # get user Profile
-        prof = self._getProfileFromUser()
+        prof = self._getProfileFromUser(forUpdate=bool(save_request))
         # if saveProfile(), process user-modifyable fields
         if save_request:
+            displayName = prof.displayName
             for field in ('displayName', 'teeShirtSize'):
                 if hasattr(save_request, field):
                     val = getattr(save_request, field)
@@ -840,6 +1388,11 @@ class ConferenceApi(remote.Service):
                         else:
                             setattr(prof, field, val)
             prof.put()
+            # copy a new display name onto the user's conferences
+            if prof.displayName != displayName:
+                taskqueue.add(
+                    params = {'userId': prof.key.id()},
+                    url    = '/tasks/update_organizer_display_name')
         # return ProfileForm
         return self._copyProfileToForm(prof)
 
@@ -860,8 +1413,58 @@ class ConferenceApi(remote.Service):
         return self._doProfile(request)
 
 
+    @staticmethod
+    def _updateOrganizerDisplayName(user_id):
+        """Copy a Profile's displayName onto all the Conferences it
+        organizes, a batch at a time.
+        """
+        p_key = ndb.Key(Profile, user_id)
+        prof = p_key.get()
+        if not prof:
+            return
+        query = Conference.query(ancestor=p_key)
+        cursor, more = None, True
+        while more:
+            confs, cursor, more = query.fetch_page(
+                ORGANIZER_UPDATE_BATCH_SIZE, start_cursor=cursor)
+            stale = [conf for conf in confs
+                     if conf.organizerDisplayName != prof.displayName]
+            for conf in stale:
+                conf.organizerDisplayName = prof.displayName
+            ndb.put_multi(stale)
+            for conf in stale:
+                versions.bumpVersion(versions.conference(conf.key))
+
+
 # - - - Registration - - - - - - - - - - - - - - - - - - - -
 
+    @staticmethod
+    def _getRegisteredConferenceKeys(prof, c_keys):
+        """Return the set of c_keys the Profile's user is registered for,
+        checking all their Registrations in a single batch.
+        """
+        c_keys = list(c_keys)
+        registrations = ndb.get_multi(
+            [ndb.Key(Registration, c_key.urlsafe(), parent=prof.key)
+             for c_key in c_keys])
+        legacy = set(prof.conferenceKeysToAttend)
+        return set(c_key for c_key, registration in zip(c_keys, registrations)
+                   if registration or c_key in legacy)
+
+    @staticmethod
+    def _getConferenceKeysToAttend(prof):
+        """Return the keys of the Conferences the Profile's user attends.
+
+        Registrations made before the Registration index existed are still
+        read from Profile.conferenceKeysToAttend.
+        """
+        reg_keys = Registration.query(ancestor=prof.key).fetch(keys_only=True)
+        c_keys = [ndb.Key(urlsafe=reg_key.id()) for reg_key in reg_keys]
+        registered = set(c_keys)
+        c_keys.extend(c_key for c_key in prof.conferenceKeysToAttend
+                      if c_key not in registered)
+        return c_keys
+
     @ndb.transactional(xg=True)
     def _conferenceRegistration(self, request, reg=True):
         """Register or unregister user for selected conference."""
@@ -870,40 +1473,101 @@ class ConferenceApi(remote.Service):
         # check if conf exists given websafeConfKey
         # get conference; check that it exists
         wsck = request.websafeConferenceKey
-        conf = ndb.Key(urlsafe=wsck).get()
+        conf = cache.getEntity(ndb.Key(urlsafe=wsck))
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % wsck)
+        # the user's Registration lives in their Profile's entity group
+        reg_key = ndb.Key(Registration, conf.key.urlsafe(), parent=prof.key)
+        registration = reg_key.get()
+        legacy = conf.key in prof.conferenceKeysToAttend
         # register
         if reg:
             # check if user already registered otherwise add
-            if wsck in prof.conferenceKeysToAttend:
+            if registration or legacy:
                 raise ConflictException(
                     "You have already registered for this conference")
-            # check if seats avail
-            if conf.seatsAvailable <= 0:
+            # take away one seat from the seat counter, if any are left
+            if not seats.takeSeat(conf):
                 raise ConflictException(
                     "There are no seats available.")
-            # register user, take away one seat
-            prof.conferenceKeysToAttend.append(wsck)
-            conf.seatsAvailable -= 1
+            # register user
+            Registration(key=reg_key, conferenceKey=conf.key).put()
             retval = True
         # unregister
         else:
             # check if user already registered
-            if wsck in prof.conferenceKeysToAttend:
-
+            if registration or legacy:
                 # unregister user, add back one seat
-                prof.conferenceKeysToAttend.remove(wsck)
-                conf.seatsAvailable += 1
+                if registration:
+                    reg_key.delete()
+                if legacy:
+                    prof.conferenceKeysToAttend.remove(conf.key)
+                    prof.put()
+                seats.releaseSeat(conf)
                 retval = True
             else:
                 retval = False
-        # write things back to the datastore & return
-        prof.put()
-        conf.put()
+        # the seats shown with the Conference may have changed
+        if retval:
+            versions.bumpVersion(versions.conference(conf.key))
+            versions.bumpVersion(versions.CONFERENCES)
+        # neither the Conference nor, usually, the Profile is rewritten
         return BooleanMessage(data=retval)
 
+    @endpoints.method(CONF_ATTENDEES_GET_REQUEST, AttendeeForms,
+                      path        = 'conference/{websafeConferenceKey}/'
+                                    'attendees',
+                      http_method = 'GET',
+                      name        = 'getConferenceAttendees')
+    def getConferenceAttendees(self, request):
+        """Return a page of a conference's attendees, for its organizer."""
+        # make sure user is authed
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+        try:
+            c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+        except Exception:
+            raise endpoints.BadRequestException(
+                'The websafeConferenceKey given is invalid.')
+        conf = cache.getEntity(c_key)
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s'
+                % request.websafeConferenceKey)
+        # check that user is owner
+        if user_id != conf.organizerUserId:
+            raise endpoints.ForbiddenException(
+                'Only the owner can list the conference attendees.')
+        page_size = request.pageSize or QUERY_PAGE_SIZE
+        if page_size < 1 or page_size > QUERY_MAX_PAGE_SIZE:
+            raise endpoints.BadRequestException(
+                'pageSize must be between 1 and %d.' % QUERY_MAX_PAGE_SIZE)
+        cursor = None
+        if request.websafeCursor:
+            try:
+                cursor = ndb.Cursor(urlsafe=request.websafeCursor)
+            except Exception:
+                raise endpoints.BadRequestException(
+                    'The websafeCursor given is invalid.')
+        # Registration keys are enough: their parents are the attendees
+        reg_keys, next_cursor, more = Registration.query(
+            Registration.conferenceKey == c_key).fetch_page(
+                page_size, start_cursor=cursor, keys_only=True)
+        profiles = ndb.get_multi([reg_key.parent() for reg_key in reg_keys])
+        # the count is the seats taken in the seat counter rather than a
+        # scan; seatsAvailable would hide attendees over a lowered
+        # maxAttendees
+        return AttendeeForms(
+            items         = [AttendeeForm(displayName = prof.displayName,
+                                          mainEmail   = prof.mainEmail)
+                             for prof in profiles if prof],
+            attendeeCount = seats.getSeatsTaken(conf),
+            websafeCursor = next_cursor.urlsafe() if more else None,
+            more          = more)
+
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
                       path        = 'conferences/attending',
                       http_method = 'GET',
@@ -911,22 +1575,14 @@ class ConferenceApi(remote.Service):
     def getConferencesToAttend(self, request):
         """Get list of conferences that user has registered for."""
         prof = self._getProfileFromUser()  # get user Profile
-        conf_keys = [ndb.Key(urlsafe=wsck) for wsck in
-                     prof.conferenceKeysToAttend]
+        conf_keys = self._getConferenceKeysToAttend(prof)
         conferences = ndb.get_multi(conf_keys)
-        # get organizers
-        organisers = [ndb.Key(Profile, conf.organizerUserId) for conf in
-                      conferences]
-        profiles = ndb.get_multi(organisers)
-        # put display names in a dict for easier fetching
-        names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
+        self._fillOrganizerDisplayNames(conferences)
+        available = seats.getSeatsAvailableMulti(conferences)
         # return set of ConferenceForm objects per Conference
         return ConferenceForms(
-            items=[self._copyConferenceToForm(
-                conf, names[conf.organizerUserId])
-                for conf in conferences])
+            items=[self._copyConferenceToForm(conf, available[conf.key])
+                   for conf in conferences])
 
     @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
                       path        = 'conference/{websafeConferenceKey}',
@@ -934,7 +1590,10 @@ class ConferenceApi(remote.Service):
                       name        = 'registerForConference')
     def registerForConference(self, request):
         """Register user for selected conference."""
-        return self._conferenceRegistration(request)
+        result = self._conferenceRegistration(request)
+        self._updateNearlySoldOut(
+            ndb.Key(urlsafe=request.websafeConferenceKey))
+        return result
 
     @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
                       path        = 'conference/{websafeConferenceKey}',
@@ -942,81 +1601,214 @@ class ConferenceApi(remote.Service):
                       name        = 'unregisterFromConference')
     def unregisterFromConference(self, request):
         """Unregister user for selected conference."""
-        return self._conferenceRegistration(request, reg=False)
+        result = self._conferenceRegistration(request, reg=False)
+        if result.data:
+            self._updateNearlySoldOut(
+                ndb.Key(urlsafe=request.websafeConferenceKey))
+        return result
 
 
 # - - - Announcements - - - - - - - - - - - - - - - - - - - -
 
+    @staticmethod
+    def _isNearlySoldOut(available):
+        """Return True if a conference with available seats left is nearly
+        sold out.
+        """
+        return 0 < available <= NEARLY_SOLD_OUT_SEATS
+
+    @staticmethod
+    @ndb.transactional()
+    def _putNearlySoldOut(add, remove):
+        """Add and remove Conference keys in the nearly sold out set;
+        returns True if the set changed.
+        """
+        nso = NEARLY_SOLD_OUT_KEY.get() or NearlySoldOut(
+            key=NEARLY_SOLD_OUT_KEY)
+        remove = set(remove)
+        c_keys = [c_key for c_key in nso.conferenceKeys
+                  if c_key not in remove]
+        present = set(c_keys)
+        c_keys.extend(c_key for c_key in add if c_key not in present)
+        if c_keys == nso.conferenceKeys:
+            return False
+        nso.conferenceKeys = c_keys
+        nso.put()
+        return True
+
+    @staticmethod
+    def _updateNearlySoldOut(c_key, force=False):
+        """Move a conference in or out of the nearly sold out set after its
+        seats changed, refreshing the announcement if the set changed.
+
+        Unless forced, conferences well clear of the band are skipped
+        without touching the set.
+        """
+        conf = cache.getEntity(c_key)
+        if not conf:
+            return
+        available = seats.getSeatsAvailable(conf)
+        # a single registration moves the count by one seat, so only a
+        # count at or next to the band can have crossed its edges
+        if not force and available > NEARLY_SOLD_OUT_SEATS + 1:
+            return
+        if ConferenceApi._isNearlySoldOut(available):
+            changed = ConferenceApi._putNearlySoldOut([c_key], [])
+        else:
+            changed = ConferenceApi._putNearlySoldOut([], [c_key])
+        if changed:
+            ConferenceApi._cacheAnnouncement()
+
+    @staticmethod
+    def _rescanNearlySoldOut():
+        """Rebuild the nearly sold out set from every conference's seats.
+
+        Run as a periodic repair; registrations keep the set current.
+        """
+        # Seat counts live in the sharded seat counter, so check every
+        # conference that has seats at all, a batch at a time
+        add, remove = [], []
+        query = Conference.query(Conference.maxAttendees > 0)
+        batch, cursor, more = query.fetch_page(ANNOUNCEMENT_BATCH_SIZE)
+        while batch:
+            available = seats.getSeatsAvailableMulti(batch)
+            for conf in batch:
+                if ConferenceApi._isNearlySoldOut(available[conf.key]):
+                    add.append(conf.key)
+                else:
+                    remove.append(conf.key)
+            if not more:
+                break
+            batch, cursor, more = query.fetch_page(
+                ANNOUNCEMENT_BATCH_SIZE, start_cursor=cursor)
+        # drop any conference that no longer exists or has no seats
+        nso = NEARLY_SOLD_OUT_KEY.get()
+        if nso:
+            checked = set(add)
+            remove.extend(c_key for c_key in nso.conferenceKeys
+                          if c_key not in checked)
+        ConferenceApi._putNearlySoldOut(add, remove)
+        return ConferenceApi._cacheAnnouncement()
+
+    @staticmethod
+    def _buildAnnouncement():
+        """Return the Announcement for the nearly sold out set."""
+        nso = NEARLY_SOLD_OUT_KEY.get()
+        if not nso or not nso.conferenceKeys:
+            return ""
+        confs = [conf for conf in ndb.get_multi(nso.conferenceKeys) if conf]
+        if not confs:
+            return ""
+        return '%s %s' % (
+            'Last chance to attend! The following conferences '
+            'are nearly sold out:',
+            ', '.join(conf.name for conf in confs))
+
     @staticmethod
     def _cacheAnnouncement():
         """Create Announcement & assign to memcache.
         """
-        confs = Conference.query(ndb.AND(
-            Conference.seatsAvailable <= 5,
-            Conference.seatsAvailable > 0)
-        ).fetch(projection=[Conference.name])
-        if confs:
-            # If there are almost sold out conferences,
-            # format announcement and set it in memcache
-            announcement = '%s %s' % (
-                'Last chance to attend! The following conferences '
-                'are nearly sold out:',
-                ', '.join(conf.name for conf in confs))
-            memcache.set(MEMCACHE_ANNOUNCEMENTS_KEY, announcement)
-        else:
-            # If there are no sold out conferences,
-            # delete the memcache announcements entry
-            announcement = ""
-            memcache.delete(MEMCACHE_ANNOUNCEMENTS_KEY)
+        # An empty announcement is cached too, so that it isn't mistaken
+        # for a memcache miss
+        announcement = ConferenceApi._buildAnnouncement()
+        memcache.set(MEMCACHE_ANNOUNCEMENTS_KEY, announcement)
+        versions.bumpVersion(versions.ANNOUNCEMENT)
         return announcement
 
-    @endpoints.method(message_types.VoidMessage, StringMessage,
+    @staticmethod
+    def _getOrRebuild(key, build):
+        """Return the value of memcache key, rebuilding it on a miss.
+
+        Only the request holding the key's lock calls build() and caches
+        the result; the others wait for it, and build it themselves
+        (without caching it) if it takes too long.
+        """
+        value = memcache.get(key)
+        if value is not None:
+            return value
+        lock = MEMCACHE_LOCK_KEY % key
+        if memcache.add(lock, 1, time=REBUILD_LOCK_TIMEOUT):
+            try:
+                value = build()
+                memcache.set(key, value)
+            finally:
+                memcache.delete(lock)
+            return value
+        for _ in range(REBUILD_LOCK_TRIES):
+            time.sleep(REBUILD_LOCK_WAIT)
+            value = memcache.get(key)
+            if value is not None:
+                return value
+        return build()
+
+    @endpoints.method(VERSIONED_GET_REQUEST, StringMessage,
                       path        = 'conference/announcement/get',
                       http_method = 'GET',
                       name        = 'getAnnouncement')
     def getAnnouncement(self, request):
         """Return Announcement from memcache."""
-        # return an existing announcement from Memcache or an empty string.
-        announcement = memcache.get(MEMCACHE_ANNOUNCEMENTS_KEY)
-        if not announcement:
-            announcement = ""
-        return StringMessage(data=announcement)
+        # Answer "not modified" if the client already has this version
+        version = versions.getVersion(versions.ANNOUNCEMENT)
+        if request.version == version:
+            return StringMessage(data="", version=version, notModified=True)
+        announcement = self._getOrRebuild(MEMCACHE_ANNOUNCEMENTS_KEY,
+                                          self._buildAnnouncement)
+        return StringMessage(data=announcement, version=version)
 
 
 # - - - Featured Speakers - - - - - - - - - - - - - - - - - - - -
 
     @staticmethod
-    def _cacheFeaturedSpeaker(websafeConferenceKey, websafeSpeakerKey):
-        """Create Featured Speaker & assign to memcache."""
-        # TODO The example given was to perform checks here
-        # (ie speaker in 2 or more sessions), however for this function,
-        # I performed the check in the _createSessionObject function
-        # Which is better and why?
+    def _buildFeaturedSpeaker(c_key):
+        """Return the Featured Speaker of the Conference with key c_key."""
+        # Read the speaker with the most Sessions from the SpeakerCounts
+        for top in SpeakerCount.query(ancestor=c_key).order(
+                -SpeakerCount.sessionCount):
+            if top.sessionCount < FEATURED_SPEAKER_MIN_SESSIONS:
+                break
+            conf, speaker = ndb.get_multi(
+                [c_key, ndb.Key(urlsafe=top.key.id())])
+            if not conf:
+                break
+            # the SpeakerCount of a deleted Speaker may outlive it
+            if speaker:
+                return '{0}{1}{2}'.format(speaker.name,
+                                          ' has been added as a'
+                                          ' featured speaker at ',
+                                          conf.name)
+        return ""
 
+    @staticmethod
+    def _cacheFeaturedSpeaker(websafeConferenceKey):
+        """Create Featured Speaker & assign to memcache."""
         c_key = ndb.Key(urlsafe=websafeConferenceKey)
-        conf = c_key.get()
-        print '::::: conf = {0}'.format(conf)
-
-        s_key = ndb.Key(urlsafe=websafeSpeakerKey)
-        speaker = s_key.get()
-
-        featured = '{0}{1}{2}'.format(speaker.name,
-                                      ' has been added as a'
-                                      ' featured speaker at ',
-                                      conf.name)
-        memcache.set(MEMCACHE_FEATURED_SPEAKER_KEY, featured)
+        featured = ConferenceApi._buildFeaturedSpeaker(c_key)
+        memcache.set(MEMCACHE_FEATURED_SPEAKER_KEY % websafeConferenceKey,
+                     featured)
+        versions.bumpVersion(versions.featuredSpeaker(c_key))
         return featured
 
-    @endpoints.method(message_types.VoidMessage, StringMessage,
-                      path        = 'featured_speaker/get',
+    @endpoints.method(CONF_VERSIONED_GET_REQUEST, StringMessage,
+                      path        = 'featured_speaker/{websafeConferenceKey}',
                       http_method = 'GET',
                       name        = 'getFeaturedSpeaker')
     def getFeaturedSpeaker(self, request):
-        """Return Featured Speaker from memcache."""
-        # return an existing Featured Speaker from Memcache or an empty string.
-        featured = memcache.get(MEMCACHE_FEATURED_SPEAKER_KEY)
-        if not featured:
-            featured = ""
-        return StringMessage(data=featured)
+        """Return a conference's Featured Speaker from memcache."""
+        wsck = request.websafeConferenceKey
+        try:
+            c_key = ndb.Key(urlsafe=wsck)
+        except Exception:
+            raise endpoints.BadRequestException(
+                'The websafeConferenceKey given is invalid.')
+        # Answer "not modified" if the client already has this version
+        version = versions.getVersion(versions.featuredSpeaker(c_key))
+        if request.version == version:
+            return StringMessage(data="", version=version, notModified=True)
+        # return the cached Featured Speaker; a burst of requests after an
+        # eviction rebuilds it only once
+        featured = self._getOrRebuild(
+            MEMCACHE_FEATURED_SPEAKER_KEY % wsck,
+            lambda: self._buildFeaturedSpeaker(c_key))
+        return StringMessage(data=featured, version=version)
 
 api = endpoints.api_server([ConferenceApi])  # register API
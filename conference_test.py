@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+
+"""conference_test.py
+
+Udacity conference server-side Python App Engine endpoint tests
+
+Calls ConferenceApi methods directly, as the signed-in user0@example.com,
+on the App Engine testbed stubs:
+
+    APPENGINE_SDK=~/google_appengine python conference_test.py
+
+$Id$
+
+"""
+
+import os
+import sys
+import unittest
+
+USER_EMAIL = 'user0@example.com'
+
+
+def _setupPath(sdk):
+    """Put the App Engine SDK and its bundled libraries on sys.path."""
+    if sdk:
+        sys.path.insert(0, os.path.expanduser(sdk))
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def req(container, **kwargs):
+    """Return a request message for an endpoint's request type."""
+    return getattr(container, 'combined_message_class', container)(**kwargs)
+
+
+class ConferenceApiTest(unittest.TestCase):
+
+    def setUp(self):
+        from google.appengine.datastore import datastore_stub_util
+        from google.appengine.ext import ndb
+        from google.appengine.ext import testbed
+
+        self.bed = testbed.Testbed()
+        self.bed.activate()
+        # endpoints needs a major.minor version id
+        self.bed.setup_env(app_id='udacity-p4-conforg',
+                           current_version_id='v1.1', overwrite=True)
+        os.environ['ENDPOINTS_AUTH_EMAIL'] = USER_EMAIL
+        os.environ['ENDPOINTS_AUTH_DOMAIN'] = 'example.com'
+        self.bed.init_datastore_v3_stub(
+            consistency_policy=datastore_stub_util
+            .PseudoRandomHRConsistencyPolicy(probability=1),
+            require_indexes=True,
+            root_path=os.path.dirname(os.path.abspath(__file__)))
+        self.bed.init_memcache_stub()
+        self.bed.init_taskqueue_stub(
+            root_path=os.path.dirname(os.path.abspath(__file__)))
+        self.bed.init_search_stub()
+        self.bed.init_app_identity_stub()
+        self.bed.init_mail_stub()
+        ndb.get_context().clear_cache()
+
+        import cache
+        import conference
+        cache.clear()
+        self.conference = conference
+        self.api = conference.ConferenceApi()
+
+    def tearDown(self):
+        import cache
+        cache.clear()
+        self.bed.deactivate()
+
+    def createConference(self, **kwargs):
+        """Create a Conference and return its websafe key."""
+        from models import ConferenceForm
+
+        fields = dict(name='PyCon', city='London', topics=['Web'],
+                      startDate='2026-11-02', endDate='2026-11-04',
+                      maxAttendees=10)
+        fields.update(kwargs)
+        self.api.createConference(ConferenceForm(**fields))
+        created = self.api.getConferencesCreated(
+            req(self.conference.CONF_CREATED_REQUEST))
+        return [cf.websafeKey for cf in created.items
+                if cf.name == fields['name']][0]
+
+    def testCreateConferenceRoundTrip(self):
+        wsck = self.createConference()
+        cf = self.api.getConference(req(
+            self.conference.CONF_VERSIONED_GET_REQUEST,
+            websafeConferenceKey=wsck))
+        self.assertEqual(cf.name, 'PyCon')
+        self.assertEqual(cf.city, 'London')
+        self.assertEqual(cf.topics, ['Web'])
+        self.assertEqual(cf.startDate, '2026-11-02')
+        self.assertEqual(cf.endDate, '2026-11-04')
+        self.assertEqual(cf.month, 11)
+        self.assertEqual(cf.maxAttendees, 10)
+        self.assertEqual(cf.seatsAvailable, 10)
+        self.assertEqual(cf.organizerUserId, USER_EMAIL)
+        self.assertEqual(cf.websafeKey, wsck)
+        self.assertTrue(cf.version)
+        self.assertFalse(cf.notModified)
+        # the version handed out answers "not modified" next time
+        again = self.api.getConference(req(
+            self.conference.CONF_VERSIONED_GET_REQUEST,
+            websafeConferenceKey=wsck, version=cf.version))
+        self.assertTrue(again.notModified)
+
+    def testOrganizerNameNotReadFromInstanceCache(self):
+        import time
+        from google.appengine.ext import ndb
+        import cache
+        from models import Profile
+
+        p_key = ndb.Key(Profile, USER_EMAIL)
+        Profile(key=p_key, displayName='New Name',
+                mainEmail=USER_EMAIL).put()
+        # as if the rename had been made on another instance
+        cache._store(p_key.urlsafe(),
+                     Profile(key=p_key, displayName='Old Name',
+                             mainEmail=USER_EMAIL),
+                     time.time())
+        wsck = self.createConference()
+        self.assertEqual(
+            ndb.Key(urlsafe=wsck).get().organizerDisplayName, 'New Name')
+
+    def testLegacySeatsSeededOnce(self):
+        from google.appengine.ext import ndb
+        from models import Conference
+        import seats
+
+        # registered against before the seat counter: 3 of 10 seats taken
+        c_key = Conference(name='Legacy', organizerUserId=USER_EMAIL,
+                           maxAttendees=10, seatsAvailable=7).put()
+        wsck = c_key.urlsafe()
+        self.api.registerForConference(req(
+            self.conference.CONF_GET_REQUEST, websafeConferenceKey=wsck))
+        shard_keys = [seats._shardKey(c_key, index)
+                      for index in range(seats.SHARD_COUNT)]
+        # registering wrote a single shard
+        self.assertEqual(len(filter(None, ndb.get_multi(shard_keys))), 1)
+        self.assertEqual(seats.getSeatsTaken(c_key.get()), 4)
+        # the cached count is of seats taken, so maxAttendees is live
+        conf = c_key.get()
+        conf.maxAttendees = 20
+        self.assertEqual(seats.getSeatsAvailable(conf), 16)
+
+        # a new maxAttendees seeds every shard first
+        self.api._updateConferenceObject(req(
+            self.conference.CONF_POST_REQUEST, websafeConferenceKey=wsck,
+            maxAttendees=30))
+        conf = c_key.get()
+        self.assertTrue(conf.seatShardsSeeded)
+        self.assertTrue(all(ndb.get_multi(shard_keys)))
+        cf = self.api.getConference(req(
+            self.conference.CONF_VERSIONED_GET_REQUEST,
+            websafeConferenceKey=wsck))
+        self.assertEqual(cf.seatsAvailable, 26)
+        self.api.unregisterFromConference(req(
+            self.conference.CONF_GET_REQUEST, websafeConferenceKey=wsck))
+        self.assertEqual(seats.getSeatsAvailable(c_key.get()), 27)
+
+    def testAttendeeCountOverLoweredCapacity(self):
+        wsck = self.createConference(maxAttendees=5)
+        self.api.registerForConference(req(
+            self.conference.CONF_GET_REQUEST, websafeConferenceKey=wsck))
+        self.api._updateConferenceObject(req(
+            self.conference.CONF_POST_REQUEST, websafeConferenceKey=wsck,
+            maxAttendees=0))
+        attendees = self.api.getConferenceAttendees(req(
+            self.conference.CONF_ATTENDEES_GET_REQUEST,
+            websafeConferenceKey=wsck))
+        self.assertEqual([af.mainEmail for af in attendees.items],
+                         [USER_EMAIL])
+        self.assertEqual(attendees.attendeeCount, 1)
+
+    def testSessionSummaryAndFullVersionsDiffer(self):
+        from models import SessionForm
+
+        wsck = self.createConference()
+        self.api.createSession(SessionForm(
+            name='Keynote', highlights='Opening', parentConfKey=wsck,
+            date='2026-11-02', startTime='10:00'))
+        summary = self.api.getConferenceSessions(req(
+            self.conference.SESH_GET_REQUEST, websafeConferenceKey=wsck,
+            summary=True))
+        self.assertIsNone(summary.items[0].highlights)
+        # the summary's stamp doesn't stand in for the full listing
+        full = self.api.getConferenceSessions(req(
+            self.conference.SESH_GET_REQUEST, websafeConferenceKey=wsck,
+            version=summary.version))
+        self.assertFalse(full.notModified)
+        self.assertEqual(full.items[0].highlights, 'Opening')
+        again = self.api.getConferenceSessions(req(
+            self.conference.SESH_GET_REQUEST, websafeConferenceKey=wsck,
+            version=full.version))
+        self.assertTrue(again.notModified)
+
+    def testSearchSessionsWithinConference(self):
+        import endpoints
+        from models import SessionForm
+        import searchindex
+
+        wsck = self.createConference()
+        other = self.createConference(name='DjangoCon')
+        for parent in (wsck, other):
+            self.api.createSession(SessionForm(
+                name='Keynote', parentConfKey=parent,
+                date='2026-11-02', startTime='10:00'))
+        found = self.api.searchSessions(req(
+            self.conference.SEARCH_REQUEST, query='Keynote',
+            websafeConferenceKey=wsck))
+        self.assertEqual([sf.parentConfKey for sf in found.items], [wsck])
+        # anything but a Conference key is turned away
+        for bad in (wsck + '") OR ("', found.items[0].websafeKey):
+            self.assertRaises(
+                endpoints.BadRequestException, self.api.searchSessions,
+                req(self.conference.SEARCH_REQUEST, query='Keynote',
+                    websafeConferenceKey=bad))
+        # quotes in the key can't end the quoted string
+        self.assertEqual(searchindex.searchSessions(
+            'Keynote', 10, websafeConferenceKey='x" OR "y'), ([], None))
+
+    def testFeaturedSpeakerSkipsDeletedSpeaker(self):
+        from google.appengine.ext import ndb
+        from models import SpeakerCount
+
+        c_key = ndb.Key(urlsafe=self.createConference())
+        gone, ada = [ndb.Key(urlsafe=wssk)
+                     for wssk in self.createSpeakers('Gone', 'Ada')]
+        gone.delete()
+        top = self.conference.FEATURED_SPEAKER_MIN_SESSIONS
+        ndb.put_multi([
+            SpeakerCount(key=ndb.Key(SpeakerCount, gone.urlsafe(),
+                                     parent=c_key), sessionCount=top + 1),
+            SpeakerCount(key=ndb.Key(SpeakerCount, ada.urlsafe(),
+                                     parent=c_key), sessionCount=top)])
+        self.assertEqual(
+            self.api._buildFeaturedSpeaker(c_key),
+            'Ada has been added as a featured speaker at PyCon')
+        ada.delete()
+        self.assertEqual(self.api._buildFeaturedSpeaker(c_key), '')
+
+    def testCachedQueriesAreRecorded(self):
+        import indexadvisor
+        from models import ConferenceQueryForm
+        from models import ConferenceQueryForms
+
+        self.createConference()
+        request = ConferenceQueryForms(filters=[
+            ConferenceQueryForm(field='CITY', operator='EQ', value='London')])
+        shape = indexadvisor.shapeName(['city'])
+        before = indexadvisor._pending[shape]
+        first = self.api.queryConferences(request)
+        # the second one is answered from the query cache
+        second = self.api.queryConferences(request)
+        self.assertEqual(second, first)
+        self.assertEqual(indexadvisor._pending[shape], before + 2)
+
+    def createSpeakers(self, *names):
+        """Store Speakers and return their websafe keys."""
+        from google.appengine.ext import ndb
+        from models import Speaker
+
+        return [key.urlsafe() for key in ndb.put_multi(
+            [Speaker(name=name) for name in names])]
+
+    def testGetSpeakersByConference(self):
+        from models import SessionForm
+
+        wsck = self.createConference()
+        ada, grace, linus = self.createSpeakers('Ada', 'Grace', 'Linus')
+        for name, wssks in (('Keynote', [ada]), ('Panel', [ada, grace]),
+                            ('Workshop', [grace])):
+            self.api.createSession(SessionForm(
+                name=name, speakerKey=wssks, parentConfKey=wsck,
+                date='2026-11-02', startTime='10:00'))
+        request = req(self.conference.CONF_GET_REQUEST,
+                      websafeConferenceKey=wsck)
+        speakers = self.api.getSpeakersByConference(request)
+        self.assertEqual(sorted(sf.name for sf in speakers.items),
+                         ['Ada', 'Grace'])
+        # a new Session's speaker shows up despite the cached set
+        self.api.createSession(SessionForm(
+            name='Demo', speakerKey=[linus], parentConfKey=wsck,
+            date='2026-11-03', startTime='11:00'))
+        speakers = self.api.getSpeakersByConference(request)
+        self.assertEqual(sorted(sf.name for sf in speakers.items),
+                         ['Ada', 'Grace', 'Linus'])
+
+
+if __name__ == '__main__':
+    _setupPath(os.getenv('APPENGINE_SDK'))
+    unittest.main()
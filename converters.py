@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""converters.py
+
+Udacity conference server-side Python App Engine entity-to-message
+    converters; the field mapping for each model/message pair is worked
+    out once and reused for every entity copied afterwards
+
+$Id$
+
+"""
+
+from protorpc import messages
+from google.appengine.ext import ndb
+
+# Properties whose values go out as strings
+_STRING_PROPERTIES = (ndb.DateProperty, ndb.TimeProperty,
+                      ndb.DateTimeProperty)
+
+_registry = {}  # (model class, message class, fields) -> converter
+
+
+def _enumLookup(enum):
+    """Return a transform mapping a stored enum name to its enum value."""
+    return lambda value: getattr(enum, value)
+
+
+def _urlsafe(key):
+    """Return a key as a websafe string."""
+    return key.urlsafe() if key else None
+
+
+def _urlsafeAll(keys):
+    """Return a list of keys as websafe strings."""
+    return [key.urlsafe() for key in keys]
+
+
+def _buildConverter(model, message, fields):
+    """Return a function copying a model entity into a new message.
+
+    With fields, only those message fields are copied, e.g. for entities
+    loaded by a projection query.
+    """
+    plan = []
+    for field in message.all_fields():
+        if fields is not None and field.name not in fields:
+            continue
+        prop = model._properties.get(field.name)
+        if prop is not None:
+            # ndb property; pick its transform once, up front
+            if isinstance(prop, _STRING_PROPERTIES):
+                transform = str
+            elif isinstance(prop, ndb.KeyProperty):
+                transform = _urlsafeAll if prop._repeated else _urlsafe
+            elif isinstance(field, messages.EnumField):
+                transform = _enumLookup(field.type)
+            else:
+                transform = None
+            plan.append((field.name, prop._code_name, transform))
+        elif field.name == 'websafeKey':
+            plan.append((field.name, None, None))
+
+    def convert(entity):
+        msg = message()
+        for name, code_name, transform in plan:
+            if code_name is None:
+                setattr(msg, name, entity.key.urlsafe())
+            elif transform is None:
+                setattr(msg, name, getattr(entity, code_name))
+            else:
+                setattr(msg, name, transform(getattr(entity, code_name)))
+        return msg
+    return convert
+
+
+def getConverter(model, message, fields=None):
+    """Return the (cached) converter from model entities to message."""
+    if fields is not None:
+        fields = frozenset(fields)
+    converter = _registry.get((model, message, fields))
+    if converter is None:
+        converter = _registry[(model, message, fields)] = _buildConverter(
+            model, message, fields)
+    return converter
+
+
+def copyToForm(entity, message, fields=None):
+    """Copy an entity into a new message of class message."""
+    return getConverter(type(entity), message, fields)(entity)
+
+
+def copyAllToForms(entities, message, fields=None):
+    """Copy a list of entities of one kind into new messages."""
+    if not entities:
+        return []
+    convert = getConverter(type(entities[0]), message, fields)
+    return [convert(entity) for entity in entities]
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""indexadvisor.py
+
+Udacity conference server-side Python App Engine composite index advisor
+
+queryConferences records the shape of every Conference query it runs: the
+fields it filters on by equality and its inequality field, if any.  From
+the shapes seen, proposeIndexes() works out the smallest set of composite
+indexes that serves them through zigzag merge joins: one narrow index per
+equality field, ending in the query's sort order, instead of one wide index
+per combination of fields.
+
+$Id$
+
+"""
+
+import itertools
+import threading
+from collections import Counter
+
+from google.appengine.api import memcache
+
+MEMCACHE_SHAPE_KEY = "QUERY_SHAPE_%s"  # % shape name
+
+# Queries counted per instance before the counts are added to memcache
+FLUSH_EVERY = 50
+
+_lock    = threading.Lock()
+_pending = Counter()  # shape name -> queries not yet flushed
+
+
+def shapeName(equality_fields, inequality_field=None):
+    """Return the name of a query shape, e.g. 'city+topics>month'."""
+    fields = set(equality_fields)
+    fields.discard(inequality_field)
+    return '%s>%s' % ('+'.join(sorted(fields)), inequality_field or '')
+
+
+def _parseShape(name):
+    """Return (equality fields, inequality field) of a shape name."""
+    equality, inequality = name.split('>')
+    return (equality.split('+') if equality else []), (inequality or None)
+
+
+def _flush(pending):
+    """Add a dict of shape name -> count to the counts in memcache."""
+    if pending:
+        memcache.offset_multi(
+            dict((MEMCACHE_SHAPE_KEY % shape, count)
+                 for shape, count in pending.items()),
+            initial_value=0)
+
+
+def recordQuery(equality_fields, inequality_field=None):
+    """Count one query of the given shape."""
+    with _lock:
+        _pending[shapeName(equality_fields, inequality_field)] += 1
+        if sum(_pending.values()) < FLUSH_EVERY:
+            return
+        pending = dict(_pending)
+        _pending.clear()
+    _flush(pending)
+
+
+def _allShapes(fields):
+    """Yield the name of every query shape possible over fields."""
+    fields = sorted(fields)
+    for size in range(len(fields) + 1):
+        for equality in itertools.combinations(fields, size):
+            yield shapeName(equality)
+            for inequality in fields:
+                if inequality not in equality:
+                    yield shapeName(equality, inequality)
+
+
+def getShapeCounts(fields):
+    """Return a dict of shape name -> queries counted, for the shapes over
+    fields that have been seen.
+    """
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    _flush(pending)
+    keys = dict((MEMCACHE_SHAPE_KEY % shape, shape)
+                for shape in _allShapes(fields))
+    counts = memcache.get_multi(keys.keys())
+    return dict((keys[key], count) for key, count in counts.items())
+
+
+def proposeIndexes(shapes, order='name'):
+    """Return the composite indexes, as tuples of property names, that
+    serve shapes sorted by order.
+
+    A query with several equality filters zigzag merges the indexes of
+    its fields, so each equality field needs just one index: the field,
+    then the inequality field (which the query sorts on first), then
+    order.  Queries sorted on order alone use the built-in index.
+    """
+    indexes = set()
+    for shape in shapes:
+        equality, inequality = _parseShape(shape)
+        suffix = ((inequality,) if inequality else ()) + (order,)
+        if not equality and inequality:
+            indexes.add(suffix)
+        for field in equality:
+            indexes.add((field,) + suffix)
+    return sorted(indexes)
+
+
+def formatIndexYaml(indexes, kind):
+    """Return index.yaml entries for indexes on kind."""
+    lines = []
+    for properties in indexes:
+        lines.append('- kind: %s' % kind)
+        lines.append('  properties:')
+        lines.extend('  - name: %s' % name for name in properties)
+        lines.append('')
+    return '\n'.join(lines)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+"""instrumentation.py
+
+Udacity conference server-side Python App Engine per-endpoint statistics
+
+A WSGI middleware (installed in appengine_config.py) times every request
+to the ConferenceApi endpoints and the main.py handlers.  It counts the
+datastore and memcache RPCs each request makes and its response size.
+Each instance keeps the totals in memory, along with a latency histogram,
+and adds them to counters in memcache at most once every FLUSH_SECONDS.
+getStats() reads the aggregate back for /admin/endpoint_stats.
+
+$Id$
+
+"""
+
+import threading
+import time
+from collections import Counter
+
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import memcache
+
+MEMCACHE_STAT_KEY  = "STAT_%s_%s"  # % (endpoint name, counter)
+MEMCACHE_NAMES_KEY = "STAT_NAMES"
+
+# Upper bounds (ms) of the latency histogram buckets; slower requests go
+# in a final open bucket
+LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Seconds between flushes of an instance's totals to memcache
+FLUSH_SECONDS = 60
+
+# Counters kept per endpoint, besides one per latency bucket
+COUNTERS = ('requests', 'errors', 'latencyMs', 'datastoreRpcs',
+            'memcacheRpcs', 'responseBytes')
+
+SPI_PREFIX = '/_ah/spi/'
+
+_lock       = threading.Lock()
+_pending    = Counter()  # (endpoint name, counter) -> unflushed total
+_names      = set()      # endpoint names seen by this instance
+_lastFlush  = [time.time()]  # a list, so that it can be updated in place
+_local      = threading.local()
+
+
+def _bucketName(latency):
+    """Return the counter name of the histogram bucket for latency (ms)."""
+    for bound in LATENCY_BUCKETS:
+        if latency <= bound:
+            return 'le%d' % bound
+    return 'gt%d' % LATENCY_BUCKETS[-1]
+
+
+def _bucketNames():
+    return (['le%d' % bound for bound in LATENCY_BUCKETS] +
+            ['gt%d' % LATENCY_BUCKETS[-1]])
+
+
+def _countRpc(service, call, request, response):
+    """Post-call hook counting the RPCs of the current request."""
+    rpcs = getattr(_local, 'rpcs', None)
+    if rpcs is not None:
+        rpcs[service] += 1
+
+
+apiproxy_stub_map.apiproxy.GetPostCallHooks().Append(
+    'instrumentation', _countRpc)
+
+
+def _endpointName(environ):
+    """Return the name requests to environ's path are recorded under."""
+    path = environ.get('PATH_INFO', '')
+    if path.startswith(SPI_PREFIX):
+        # e.g. ConferenceApi.queryConferences
+        return path[len(SPI_PREFIX):]
+    return path
+
+
+def record(name, latency, rpcs, size, error):
+    """Add one request's figures to this instance's totals."""
+    with _lock:
+        _names.add(name)
+        _pending[(name, 'requests')] += 1
+        _pending[(name, 'errors')] += 1 if error else 0
+        _pending[(name, 'latencyMs')] += int(latency)
+        _pending[(name, 'datastoreRpcs')] += rpcs['datastore_v3']
+        _pending[(name, 'memcacheRpcs')] += rpcs['memcache']
+        _pending[(name, 'responseBytes')] += size
+        _pending[(name, _bucketName(latency))] += 1
+        if time.time() - _lastFlush[0] < FLUSH_SECONDS:
+            return
+    flush()
+
+
+def _addNames(names):
+    """Add names to the set of endpoint names kept in memcache."""
+    client = memcache.Client()
+    for _ in range(5):
+        known = client.gets(MEMCACHE_NAMES_KEY)
+        if known is None:
+            if client.add(MEMCACHE_NAMES_KEY, set(names)):
+                return
+            continue
+        if names <= known:
+            return
+        if client.cas(MEMCACHE_NAMES_KEY, known | names):
+            return
+
+
+def flush():
+    """Add this instance's totals to the counters in memcache."""
+    with _lock:
+        pending = dict((key, value) for key, value in _pending.items()
+                       if value)
+        names = set(_names)
+        _pending.clear()
+        _lastFlush[0] = time.time()
+    if not pending:
+        return
+    _addNames(names)
+    memcache.offset_multi(
+        dict((MEMCACHE_STAT_KEY % key, value)
+             for key, value in pending.items()),
+        initial_value=0)
+
+
+def _percentile(buckets, total, pct):
+    """Return the name of the histogram bucket holding the pct-th
+    percentile, e.g. 'le250' for 100-250ms.
+    """
+    seen = 0
+    for name, count in buckets:
+        seen += count
+        if seen * 100 >= total * pct:
+            return name
+    return None
+
+
+def getStats():
+    """Return a dict of endpoint name -> aggregated figures."""
+    flush()
+    names = memcache.get(MEMCACHE_NAMES_KEY) or set()
+    counters = list(COUNTERS) + _bucketNames()
+    values = memcache.get_multi([MEMCACHE_STAT_KEY % (name, counter)
+                                 for name in names for counter in counters])
+    stats = {}
+    for name in names:
+        get = lambda counter: int(values.get(
+            MEMCACHE_STAT_KEY % (name, counter), 0))
+        requests = get('requests')
+        if not requests:
+            continue
+        buckets = [(bucket, get(bucket)) for bucket in _bucketNames()]
+        stats[name] = {
+            'requests'         : requests,
+            'errors'           : get('errors'),
+            'meanLatencyMs'    : get('latencyMs') / float(requests),
+            'p50Bucket'        : _percentile(buckets, requests, 50),
+            'p90Bucket'        : _percentile(buckets, requests, 90),
+            'p99Bucket'        : _percentile(buckets, requests, 99),
+            'latencyHistogram' : dict(buckets),
+            'datastoreRpcs'    : get('datastoreRpcs') / float(requests),
+            'memcacheRpcs'     : get('memcacheRpcs') / float(requests),
+            'responseBytes'    : get('responseBytes') / float(requests),
+        }
+    return stats
+
+
+def middleware(app):
+    """Return app wrapped so that every request through it is recorded."""
+    def instrumented(environ, start_response):
+        status = []
+
+        def startResponse(status_line, headers, exc_info=None):
+            status.append(status_line)
+            if exc_info:
+                return start_response(status_line, headers, exc_info)
+            return start_response(status_line, headers)
+
+        _local.rpcs = Counter()
+        start = time.time()
+        error = True
+        size = 0
+        try:
+            result = app(environ, startResponse)
+            try:
+                chunks = []
+                for chunk in result:
+                    chunks.append(chunk)
+                    size += len(chunk)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            error = not status or int(status[0].split()[0]) >= 400
+            return chunks
+        finally:
+            rpcs, _local.rpcs = _local.rpcs, None
+            record(_endpointName(environ), (time.time() - start) * 1000,
+                   rpcs, size, error)
+    return instrumented
@@ -12,21 +12,35 @@ created by wesc on 2014 may 24
 
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
+import json
+
 import webapp2
 from google.appengine.api import app_identity
 from google.appengine.api import mail
+from google.appengine.api import memcache
 from conference import ConferenceApi
+from conference import FIELDS
+
+import cache
+import indexadvisor
+import instrumentation
+import migrations
+import outbox
 
 
 class SetAnnouncementHandler(webapp2.RequestHandler):
     def get(self):
-        """Set Announcement in Memcache."""
-        ConferenceApi._cacheAnnouncement()
+        """Rescan the nearly sold out conferences and set Announcement in
+        Memcache."""
+        ConferenceApi._rescanNearlySoldOut()
 
 
 class SendConfirmationEmailHandler(webapp2.RequestHandler):
     def post(self):
-        """Send email confirming Conference creation."""
+        """Send email confirming Conference creation.
+
+        Only drains push tasks queued before the email outbox was added.
+        """
         mail.send_mail(
             'noreply@%s.appspotmail.com' % (
                 app_identity.get_application_id()),     # from
@@ -37,15 +51,81 @@ class SendConfirmationEmailHandler(webapp2.RequestHandler):
         )
 
 
+class SendEmailDigestsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Send the email outbox as per-recipient digests."""
+        outbox.sendDigests()
+
+
 class SetFeaturedSpeakerHandler(webapp2.RequestHandler):
     def get(self):
         """Set Featured Speaker in Memcache"""
         ConferenceApi._cacheFeaturedSpeaker(
-            self.request.get('websafeConferenceKey'),
-            self.request.get('websafeSpeakerKey'))
+            self.request.get('websafeConferenceKey'))
+
+
+class UpdateOrganizerDisplayNameHandler(webapp2.RequestHandler):
+    def post(self):
+        """Copy an organizer's new display name onto their Conferences."""
+        ConferenceApi._updateOrganizerDisplayName(self.request.get('userId'))
+
+
+class CacheStatsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Report entity cache and memcache hit/miss counters."""
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(json.dumps({
+            'instance' : cache.stats(),
+            'memcache' : memcache.get_stats(),
+        }))
+
+
+class EndpointStatsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Report per-endpoint request, latency, RPC and size figures."""
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(json.dumps(instrumentation.getStats()))
+
+
+class IndexAdviceHandler(webapp2.RequestHandler):
+    def get(self):
+        """Report the Conference query shapes seen and the composite
+        indexes proposed for them."""
+        shapes = indexadvisor.getShapeCounts(FIELDS.values())
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(json.dumps({
+            'shapes'  : shapes,
+            'indexes' : indexadvisor.formatIndexYaml(
+                indexadvisor.proposeIndexes(shapes), 'Conference'),
+        }))
+
+
+class MigrateHandler(webapp2.RequestHandler):
+    def post(self):
+        """Migrate one batch of entities to the current schema."""
+        migrations.runBatch(self.request.get('step'),
+                            self.request.get('websafeCursor') or None)
+
+
+class StartMigrationHandler(webapp2.RequestHandler):
+    def get(self):
+        """Report the schema migration's progress; ?start=1 starts it, or
+        resumes it from its last batch."""
+        if self.request.get('start'):
+            migrations.startMigration()
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(json.dumps(migrations.getStatus()))
 
 app = webapp2.WSGIApplication([
     ('/crons/set_announcement', SetAnnouncementHandler),
+    ('/crons/send_email_digests', SendEmailDigestsHandler),
     ('/tasks/send_confirmation_email', SendConfirmationEmailHandler),
     ('/tasks/set_featured_speaker', SetFeaturedSpeakerHandler),
+    ('/tasks/update_organizer_display_name',
+     UpdateOrganizerDisplayNameHandler),
+    ('/admin/cache_stats', CacheStatsHandler),
+    ('/admin/index_advice', IndexAdviceHandler),
+    ('/admin/endpoint_stats', EndpointStatsHandler),
+    ('/tasks/migrate', MigrateHandler),
+    ('/admin/migrate', StartMigrationHandler),
 ], debug=True)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+"""migrations.py
+
+Udacity conference server-side Python App Engine schema migrations
+
+Schema v2 stores Key references as KeyProperty values instead of websafe
+strings, and long free text (descriptions, highlights, bios) as unindexed
+TextProperty values.  DualKeyProperty reads either form, so the app runs
+on a half-migrated datastore; the migration just rewrites every entity,
+kind by kind, in batches of MIGRATION_BATCH_SIZE.
+
+Each batch runs in its own task, which enqueues the next one along with a
+query cursor.  The progress is kept in a Migration entity, so a failed
+task is retried from its cursor, and a stopped migration can be resumed
+from /admin/migrate.  Rewriting an entity is idempotent, so a batch that
+runs twice does no harm.
+
+While rewriting, the migration also fills in what entities saved before
+later features don't yet have:
+- Conferences and Sessions are added to the search indexes
+- each Conference's SpeakerCounts are recounted from its Sessions
+- legacy seat counts are seeded into the Conferences' seat shards
+- Sessions are added to their Speakers' SpeakerSession indexes
+- registrations in Profile.conferenceKeysToAttend become Registrations
+
+$Id$
+
+"""
+
+from collections import Counter
+
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+from conference import ConferenceApi
+from conference import FEATURED_SPEAKER_MIN_SESSIONS
+from models import Conference
+from models import Migration
+from models import Profile
+from models import Registration
+from models import Session
+from models import Speaker
+from models import SpeakerCount
+
+import searchindex
+import seats
+
+SCHEMA_V2 = 'schema_v2'
+
+MIGRATION_URL        = '/tasks/migrate'
+MIGRATION_BATCH_SIZE = 100
+
+# Kinds rewritten, in order
+STEPS = ('Conference', 'Speaker', 'Session', 'Profile')
+MODELS = {
+    'Conference' : Conference,
+    'Speaker'    : Speaker,
+    'Session'    : Session,
+    'Profile'    : Profile,
+}
+
+
+@ndb.transactional()
+def _moveRegistrations(p_key):
+    """Turn a Profile's legacy conferenceKeysToAttend into Registrations.
+
+    The seats they hold are already counted, so the seat counters are
+    left alone.
+    """
+    prof = p_key.get()
+    if not prof or not prof.conferenceKeysToAttend:
+        return
+    ndb.put_multi([Registration(key=ndb.Key(Registration, c_key.urlsafe(),
+                                            parent=prof.key),
+                                conferenceKey=c_key)
+                   for c_key in set(prof.conferenceKeysToAttend)])
+    prof.conferenceKeysToAttend = []
+    prof.put()
+
+
+@ndb.transactional()
+def _rebuildSpeakerCounts(c_key):
+    """Recount c_key's SpeakerCounts from its Sessions, returning the
+    highest count.
+
+    The totals are written rather than bumped, so a rerun leaves them
+    unchanged, and the transaction keeps a Session added meanwhile from
+    being missed.
+    """
+    tally = Counter()
+    for sesh in Session.query(ancestor=c_key):
+        tally.update(set(s_key.urlsafe() for s_key in sesh.speakerKey))
+    stale = [count_key for count_key
+             in SpeakerCount.query(ancestor=c_key).iter(keys_only=True)
+             if count_key.id() not in tally]
+    ndb.put_multi([SpeakerCount(key=ndb.Key(SpeakerCount, wssk, parent=c_key),
+                                sessionCount=count)
+                   for wssk, count in tally.items()])
+    ndb.delete_multi(stale)
+    return max(tally.values() or [0])
+
+
+def _migrateBatch(step, entities):
+    """Rewrite a batch of entities in the v2 schema."""
+    if step == 'Profile':
+        # Profiles are rewritten along with their registrations
+        for prof in entities:
+            if prof.conferenceKeysToAttend:
+                _moveRegistrations(prof.key)
+            else:
+                prof.put()
+        return
+    ndb.put_multi(entities)
+    if step == 'Conference':
+        searchindex.indexConferences(entities)
+        for conf in entities:
+            if seats.legacyTaken(conf):
+                seats.seedConference(conf.key)
+            # Sessions added before SpeakerCounts existed were never counted
+            top = _rebuildSpeakerCounts(conf.key)
+            if top >= FEATURED_SPEAKER_MIN_SESSIONS:
+                ConferenceApi._cacheFeaturedSpeaker(conf.key.urlsafe())
+    elif step == 'Session':
+        searchindex.indexSessions(entities)
+        ConferenceApi._putSpeakerSessions(entities)
+
+
+def _enqueue(step, websafeCursor):
+    taskqueue.add(
+        params        = {'step'          : step,
+                         'websafeCursor' : websafeCursor or ''},
+        url           = MIGRATION_URL,
+        transactional = ndb.in_transaction())
+
+
+@ndb.transactional()
+def _advance(step, websafeCursor, next_step, next_cursor, count):
+    """Record a finished batch and enqueue the next one.
+
+    Returns False, doing nothing, if the batch had already been recorded
+    by an earlier run of the same task.
+    """
+    migration = Migration.get_by_id(SCHEMA_V2)
+    if (migration.done or migration.step != step or
+            (migration.websafeCursor or '') != (websafeCursor or '')):
+        return False
+    migration.processed += count
+    if next_step:
+        migration.step = next_step
+        migration.websafeCursor = next_cursor
+        _enqueue(next_step, next_cursor)
+    else:
+        migration.done = True
+    migration.put()
+    return True
+
+
+def runBatch(step, websafeCursor=None):
+    """Migrate the batch of step's kind starting at websafeCursor."""
+    migration = Migration.get_by_id(SCHEMA_V2)
+    if not migration or migration.done or step not in MODELS:
+        return
+    cursor = ndb.Cursor(urlsafe=websafeCursor) if websafeCursor else None
+    entities, next_cursor, more = MODELS[step].query().fetch_page(
+        MIGRATION_BATCH_SIZE, start_cursor=cursor)
+    _migrateBatch(step, entities)
+    if more and next_cursor:
+        next_step, next_cursor = step, next_cursor.urlsafe()
+    elif STEPS.index(step) + 1 < len(STEPS):
+        next_step, next_cursor = STEPS[STEPS.index(step) + 1], None
+    else:
+        next_step, next_cursor = None, None
+    _advance(step, websafeCursor, next_step, next_cursor, len(entities))
+
+
+def startMigration():
+    """Start the migration, or resume it from its last recorded batch;
+    returns the Migration.
+    """
+    migration = Migration.get_or_insert(SCHEMA_V2, step=STEPS[0])
+    if not migration.done:
+        _enqueue(migration.step, migration.websafeCursor)
+    return migration
+
+
+def getStatus():
+    """Return a dict describing the migration's progress."""
+    migration = Migration.get_by_id(SCHEMA_V2)
+    if not migration:
+        return {'started': False}
+    return {
+        'started'   : True,
+        'step'      : migration.step,
+        'processed' : migration.processed,
+        'done'      : migration.done,
+        'updated'   : str(migration.updated),
+    }
@@ -17,11 +17,25 @@ import endpoints
 from protorpc import messages
 from google.appengine.ext import ndb
 
+import cache
+import versions
+
+
+class DualKeyProperty(ndb.KeyProperty):
+    """DualKeyProperty -- KeyProperty that also reads the websafe key
+    strings stored by the first schema, until migrations.py rewrites them
+    """
+
+    def _db_get_value(self, v, unused_p):
+        if v.has_stringvalue():
+            return ndb.Key(urlsafe=v.stringvalue())
+        return super(DualKeyProperty, self)._db_get_value(v, unused_p)
+
 
 class Speaker(ndb.Model):
     """Speaker object"""
     name     = ndb.StringProperty(required=True)
-    briefBio = ndb.StringProperty()
+    briefBio = ndb.TextProperty()
     company  = ndb.StringProperty(repeated=True)
     projects = ndb.StringProperty(repeated=True)
 
@@ -42,14 +56,29 @@ class SpeakerForms(messages.Message):
 class Session(ndb.Model):
     """Session -- Session object"""
     name          = ndb.StringProperty(required=True)
-    highlights    = ndb.StringProperty()
-    speakerKey    = ndb.StringProperty(repeated=True)
+    highlights    = ndb.TextProperty()
+    speakerKey    = DualKeyProperty(kind='Speaker', repeated=True)
     duration      = ndb.IntegerProperty()  # In number of minutes
     typeOfSession = ndb.StringProperty(default='Not_Specified')
     date          = ndb.DateProperty()
     month         = ndb.IntegerProperty()
     startTime     = ndb.TimeProperty()
-    parentConfKey = ndb.StringProperty(required=True)
+    parentConfKey = DualKeyProperty(kind='Conference', required=True)
+
+
+class SpeakerSession(ndb.Model):
+    """SpeakerSession -- one of a Speaker's Sessions, kept under the Speaker
+    and keyed by the Session's websafe key
+    """
+    conferenceKey = ndb.KeyProperty(kind='Conference')
+    date          = ndb.DateProperty()
+
+
+class SpeakerCount(ndb.Model):
+    """SpeakerCount -- number of Sessions a Speaker has in a Conference;
+    keyed by the Speaker's websafe key under the parent Conference
+    """
+    sessionCount = ndb.IntegerProperty(default=0)
 
 
 class SessionForm(messages.Message):
@@ -63,11 +92,20 @@ class SessionForm(messages.Message):
     month         = messages.IntegerField(7)
     startTime     = messages.StringField(8)
     parentConfKey = messages.StringField(9)
+    websafeKey    = messages.StringField(10)
 
 
 class SessionForms(messages.Message):
     """SessionForms -- Multiple Session outbound form message"""
-    items = messages.MessageField(SessionForm, 1, repeated=True)
+    items         = messages.MessageField(SessionForm, 1, repeated=True)
+    version       = messages.StringField(2)
+    notModified   = messages.BooleanField(3)
+    websafeCursor = messages.StringField(4)  # cursor for the next page
+
+
+class SessionKeysForm(messages.Message):
+    """SessionKeysForm -- multiple websafe Session keys inbound form message"""
+    websafeSessionKeys = messages.StringField(1, repeated=True)
 
 
 class SessionType(messages.Enum):
@@ -90,8 +128,23 @@ class Profile(ndb.Model):
     displayName            = ndb.StringProperty()
     mainEmail              = ndb.StringProperty()
     teeShirtSize           = ndb.StringProperty(default='NOT_SPECIFIED')
-    conferenceKeysToAttend = ndb.StringProperty(repeated=True)
-    sessionWishList        = ndb.StringProperty(repeated=True)
+    conferenceKeysToAttend = DualKeyProperty(kind='Conference', repeated=True)
+    sessionWishList        = DualKeyProperty(kind='Session', repeated=True)
+
+    def _post_put_hook(self, future):
+        cache.invalidate(self.key)
+
+    @classmethod
+    def _post_delete_hook(cls, key, future):
+        cache.invalidate(key)
+
+
+class Registration(ndb.Model):
+    """Registration -- a user's registration for a Conference; keyed by the
+    websafe Conference key under the user's Profile
+    """
+    conferenceKey = ndb.KeyProperty(kind='Conference', required=True)
+    registeredOn  = ndb.DateTimeProperty(auto_now_add=True, indexed=False)
 
 
 class ProfileMiniForm(messages.Message):
@@ -109,6 +162,20 @@ class ProfileForm(messages.Message):
     sessionWishList        = messages.StringField(5, repeated=True)
 
 
+class AttendeeForm(messages.Message):
+    """AttendeeForm -- Conference attendee outbound form message"""
+    displayName = messages.StringField(1)
+    mainEmail   = messages.StringField(2)
+
+
+class AttendeeForms(messages.Message):
+    """AttendeeForms -- multiple AttendeeForm outbound form message"""
+    items         = messages.MessageField(AttendeeForm, 1, repeated=True)
+    attendeeCount = messages.IntegerField(2)
+    websafeCursor = messages.StringField(3)  # cursor for the next page
+    more          = messages.BooleanField(4)
+
+
 class BooleanMessage(messages.Message):
     """BooleanMessage-- outbound Boolean value message"""
     data = messages.BooleanField(1)
@@ -117,15 +184,48 @@ class BooleanMessage(messages.Message):
 class Conference(ndb.Model):
     """Conference -- Conference object"""
     name            = ndb.StringProperty(required=True)
-    description     = ndb.StringProperty()
+    description     = ndb.TextProperty()
     organizerUserId = ndb.StringProperty()
     topics          = ndb.StringProperty(repeated=True)
     city            = ndb.StringProperty()
     startDate       = ndb.DateProperty()
     month           = ndb.IntegerProperty()
     maxAttendees    = ndb.IntegerProperty()
-    seatsAvailable  = ndb.IntegerProperty()
+    seatsAvailable  = ndb.IntegerProperty(indexed=False)  # see seats.py
+    # Whether the seats taken in seatsAvailable were copied into the shards
+    seatShardsSeeded = ndb.BooleanProperty(default=False, indexed=False)
     endDate         = ndb.DateProperty()
+    # Copy of the organizer's Profile.displayName, kept in sync by a task
+    organizerDisplayName = ndb.StringProperty(indexed=False)
+
+    def _post_put_hook(self, future):
+        cache.invalidate(self.key)
+        versions.bumpVersion(versions.CONFERENCES)
+
+    @classmethod
+    def _post_delete_hook(cls, key, future):
+        cache.invalidate(key)
+        versions.bumpVersion(versions.CONFERENCES)
+
+
+class SeatShard(ndb.Model):
+    """SeatShard -- one shard of a Conference's sharded seat counter"""
+    seatsTaken = ndb.IntegerProperty(default=0, indexed=False)
+
+
+class NearlySoldOut(ndb.Model):
+    """NearlySoldOut -- the Conferences the announcement is built from"""
+    conferenceKeys = ndb.KeyProperty(kind='Conference', repeated=True,
+                                     indexed=False)
+
+
+class Migration(ndb.Model):
+    """Migration -- progress of a schema migration; keyed by its name"""
+    step          = ndb.StringProperty(indexed=False)  # kind being rewritten
+    websafeCursor = ndb.StringProperty(indexed=False)
+    processed     = ndb.IntegerProperty(default=0, indexed=False)
+    done          = ndb.BooleanProperty(default=False, indexed=False)
+    updated       = ndb.DateTimeProperty(auto_now=True, indexed=False)
 
 
 class ConferenceForm(messages.Message):
@@ -142,11 +242,15 @@ class ConferenceForm(messages.Message):
     endDate              = messages.StringField(10)  # DateTimeField()
     websafeKey           = messages.StringField(11)
     organizerDisplayName = messages.StringField(12)
+    version              = messages.StringField(13)
+    notModified          = messages.BooleanField(14)
 
 
 class ConferenceForms(messages.Message):
     """ConferenceForms -- multiple Conference outbound form message"""
-    items = messages.MessageField(ConferenceForm, 1, repeated=True)
+    items         = messages.MessageField(ConferenceForm, 1, repeated=True)
+    websafeCursor = messages.StringField(2)  # cursor for the next page
+    more          = messages.BooleanField(3)
 
 
 class TeeShirtSize(messages.Enum):
@@ -179,9 +283,14 @@ class ConferenceQueryForms(messages.Message):
     """ConferenceQueryForms --
     multiple ConferenceQueryForm inbound form message
     """
-    filters = messages.MessageField(ConferenceQueryForm, 1, repeated=True)
+    filters       = messages.MessageField(ConferenceQueryForm, 1, repeated=True)
+    pageSize      = messages.IntegerField(2)
+    websafeCursor = messages.StringField(3)
+    summary       = messages.BooleanField(4)  # name, city & startDate only
 
 
 class StringMessage(messages.Message):
     """StringMessage-- outbound (single) string message"""
-    data = messages.StringField(1, required=True)
+    data        = messages.StringField(1, required=True)
+    version     = messages.StringField(2)
+    notModified = messages.BooleanField(3)
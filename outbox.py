@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""outbox.py
+
+Udacity conference server-side Python App Engine email outbox
+
+Confirmation emails are added to the "email-outbox" pull queue, tagged with
+their recipient, instead of each getting its own push task.  A cron job runs
+sendDigests() every minute; it leases one recipient's pending emails at a
+time, sends them as a single digest and deletes them.  Anything left over
+when a run reaches its limit waits for the next one, so mail API calls stay
+bounded however many emails are queued.
+
+$Id$
+
+"""
+
+import json
+
+from google.appengine.api import app_identity
+from google.appengine.api import mail
+from google.appengine.api import taskqueue
+
+OUTBOX_QUEUE = 'email-outbox'  # defined in queue.yaml
+
+# Emails combined into one digest, digests sent per run, and the seconds a
+# run holds its leased emails before another run may send them instead
+MAX_EMAILS_PER_DIGEST = 100
+MAX_DIGESTS_PER_RUN   = 50
+LEASE_SECONDS         = 60
+
+
+def _emailTask(email, subject, body, info):
+    """Return the pull task for one email."""
+    return taskqueue.Task(
+        payload = json.dumps({'subject' : subject,
+                              'body'    : body,
+                              'info'    : info}),
+        method  = 'PULL',
+        tag     = email)
+
+
+def queueEmail(email, subject, body, info):
+    """Add an email addressed to email to the outbox."""
+    taskqueue.Queue(OUTBOX_QUEUE).add(_emailTask(email, subject, body, info))
+
+
+def _formatDigest(notes):
+    """Return the (subject, body) of the email combining notes."""
+    if len(notes) == 1:
+        # A lone email goes out just as it was queued
+        note = notes[0]
+        return note['subject'], 'Hello there, \r\n\r\n %s \r\n\r\n %s' % (
+            note['body'], note['info'])
+    subject = 'You have %d new updates from Conference Central' % len(notes)
+    body = 'Hello there, \r\n\r\n' + ''.join(
+        ' %s\r\n %s \r\n\r\n %s \r\n\r\n' % (
+            note['subject'], note['body'], note['info'])
+        for note in notes)
+    return subject, body
+
+
+def sendDigests():
+    """Send the queued emails as one digest per recipient; returns the
+    number of digests sent.
+    """
+    queue = taskqueue.Queue(OUTBOX_QUEUE)
+    sender = 'noreply@%s.appspotmail.com' % app_identity.get_application_id()
+    sent = 0
+    while sent < MAX_DIGESTS_PER_RUN:
+        # Without a tag, the tag of the oldest task is leased, i.e. all of
+        # one recipient's pending emails
+        tasks = queue.lease_tasks_by_tag(LEASE_SECONDS, MAX_EMAILS_PER_DIGEST)
+        if not tasks:
+            break
+        subject, body = _formatDigest(
+            [json.loads(task.payload) for task in tasks])
+        mail.send_mail(sender, tasks[0].tag, subject, body)
+        queue.delete_tasks(tasks)
+        sent += 1
+    return sent
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""searchindex.py
+
+Udacity conference server-side Python App Engine full-text search indexes;
+    Conferences and Sessions are mirrored into Search API documents, keyed
+    by their websafe keys, whenever they are created or updated
+
+$Id$
+
+"""
+
+from google.appengine.api import search
+
+CONFERENCE_INDEX = 'conferences'
+SESSION_INDEX    = 'sessions'
+
+# Index.put takes a limited number of documents per call
+MAX_DOCUMENTS_PER_PUT = search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST
+
+# Documents scored for relevance per query; later matches are unranked
+MAX_SCORED_DOCUMENTS = 1000
+
+
+def _conferenceDocument(conf):
+    """Return the search document for a Conference."""
+    fields = [search.TextField(name='name', value=conf.name),
+              search.TextField(name='description', value=conf.description),
+              search.TextField(name='topics', value=' '.join(conf.topics)),
+              search.TextField(name='city', value=conf.city)]
+    if conf.startDate:
+        fields.append(search.DateField(name='startDate',
+                                       value=conf.startDate))
+    return search.Document(doc_id=conf.key.urlsafe(), fields=fields)
+
+
+def _sessionDocument(sesh):
+    """Return the search document for a Session."""
+    fields = [search.TextField(name='name', value=sesh.name),
+              search.TextField(name='highlights', value=sesh.highlights),
+              search.AtomField(name='typeOfSession',
+                               value=sesh.typeOfSession),
+              # lets a search be narrowed to one Conference
+              search.AtomField(name='parentConfKey',
+                               value=sesh.parentConfKey.urlsafe())]
+    if sesh.date:
+        fields.append(search.DateField(name='date', value=sesh.date))
+    return search.Document(doc_id=sesh.key.urlsafe(), fields=fields)
+
+
+def _put(index_name, documents):
+    """Add or replace documents in an index, a batch at a time."""
+    index = search.Index(name=index_name)
+    for i in range(0, len(documents), MAX_DOCUMENTS_PER_PUT):
+        index.put(documents[i:i + MAX_DOCUMENTS_PER_PUT])
+
+
+def indexConferences(confs):
+    """Add or refresh the search documents of a list of Conferences."""
+    _put(CONFERENCE_INDEX, [_conferenceDocument(conf) for conf in confs])
+
+
+def indexSessions(sessions):
+    """Add or refresh the search documents of a list of Sessions."""
+    _put(SESSION_INDEX, [_sessionDocument(sesh) for sesh in sessions])
+
+
+def _quote(value):
+    """Return value as a quoted string of the search query language."""
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _search(index_name, query_string, limit, websafeCursor):
+    """Return (websafe keys, next websafe cursor) for a page of the
+    documents matching query_string, best matches first.
+
+    Raises search.QueryError for a malformed query or cursor.
+    """
+    try:
+        cursor = search.Cursor(web_safe_string=websafeCursor)
+    except ValueError:
+        raise search.QueryError('Invalid cursor')
+    options = search.QueryOptions(
+        limit        = limit,
+        cursor       = cursor,
+        ids_only     = True,
+        sort_options = search.SortOptions(
+            match_scorer = search.MatchScorer(),
+            expressions  = [search.SortExpression(
+                expression    = '_score',
+                direction     = search.SortExpression.DESCENDING,
+                default_value = 0)],
+            limit        = MAX_SCORED_DOCUMENTS))
+    results = search.Index(name=index_name).search(
+        search.Query(query_string=query_string, options=options))
+    next_cursor = results.cursor.web_safe_string if results.cursor else None
+    return [doc.doc_id for doc in results.results], next_cursor
+
+
+def searchConferences(query_string, limit, websafeCursor=None):
+    """Return (websafe keys, next websafe cursor) of matching
+    Conferences.
+    """
+    return _search(CONFERENCE_INDEX, query_string, limit, websafeCursor)
+
+
+def searchSessions(query_string, limit, websafeCursor=None,
+                   websafeConferenceKey=None):
+    """Return (websafe keys, next websafe cursor) of matching Sessions,
+    optionally only those of one Conference.
+    """
+    if websafeConferenceKey:
+        query_string = '(%s) parentConfKey:%s' % (
+            query_string, _quote(websafeConferenceKey))
+    return _search(SESSION_INDEX, query_string, limit, websafeCursor)
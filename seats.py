@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+"""seats.py
+
+Udacity conference server-side Python App Engine sharded seat counter
+
+Each Conference's seats are split across SHARD_COUNT root SeatShard
+entities, so registrations for one popular conference spread their writes
+over many entity groups instead of rewriting the Conference itself.  Every
+shard owns a fixed slice of maxAttendees, which keeps the oversell guard
+exact without a global lock.
+
+Conferences registered against before sharding kept their count in
+Conference.seatsAvailable.  seedShards() copies it into all of a
+conference's shards at once, before its maxAttendees is first changed or
+when the schema migration reaches it, and sets seatShardsSeeded.  Until
+then a missing shard counts its slice of the legacy count, so taking a
+seat still reads and writes a single shard.
+
+Cached counts hold the seats taken, not those available, so that a
+change of maxAttendees shows at once.  They carry the conference's seat
+version, so a count summed from shards read before a seat change
+committed is never served after it.
+
+$Id$
+
+"""
+
+import random
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import SeatShard
+
+import versions
+
+# Must stay below the 25 entity group limit of a cross-group transaction,
+# leaving room for the user's Profile and the Conference itself
+SHARD_COUNT = 20
+
+MEMCACHE_SEATS_KEY = "SEATS_TAKEN_%s"  # % websafeConferenceKey
+
+# Seconds a cached count is kept, as a bound should a version bump be lost
+SEATS_CACHE_TTL = 300
+
+
+def _shardKey(c_key, index):
+    """Return the key of shard index for the Conference key c_key."""
+    return ndb.Key(SeatShard, '%s:%d' % (c_key.urlsafe(), index))
+
+
+def _capacity(conf, index):
+    """Return the number of seats owned by shard index."""
+    base, extra = divmod(max(conf.maxAttendees or 0, 0), SHARD_COUNT)
+    return base + (1 if index < extra else 0)
+
+
+def legacyTaken(conf):
+    """Return the seats of conf taken before the seat counter existed and
+    not yet seeded into its shards.
+    """
+    if conf.seatShardsSeeded or conf.seatsAvailable is None:
+        # conferences created since start with empty shards
+        return 0
+    return max((conf.maxAttendees or 0) - conf.seatsAvailable, 0)
+
+
+def _seedTaken(conf, index):
+    """Return the seats taken on shard index before its entity existed.
+
+    The legacy seats taken fill the shards in order.
+    """
+    taken = legacyTaken(conf)
+    for i in range(index):
+        taken -= min(taken, _capacity(conf, i))
+    return min(taken, _capacity(conf, index))
+
+
+def _getShard(conf, index):
+    """Return shard index of conf, seeding it if it doesn't exist yet."""
+    key = _shardKey(conf.key, index)
+    return key.get() or SeatShard(key=key, seatsTaken=_seedTaken(conf, index))
+
+
+def seedShards(conf):
+    """Create every missing shard of conf with its slice of the legacy
+    seats taken, and mark conf seeded; returns True if conf changed and
+    must be put by the caller.
+
+    Each slice depends on maxAttendees, so this must run before it
+    changes.  It touches every shard, so it is kept out of registrations;
+    it must be called inside a cross-group transaction.
+    """
+    if not legacyTaken(conf):
+        return False
+    keys = [_shardKey(conf.key, index) for index in range(SHARD_COUNT)]
+    ndb.put_multi([SeatShard(key=key, seatsTaken=_seedTaken(conf, index))
+                   for index, (key, shard)
+                   in enumerate(zip(keys, ndb.get_multi(keys)))
+                   if shard is None])
+    conf.seatShardsSeeded = True
+    invalidate(conf.key)
+    return True
+
+
+@ndb.transactional(xg=True)
+def seedConference(c_key):
+    """Seed the shards of the Conference with key c_key, if it needs it."""
+    conf = c_key.get()
+    if conf and seedShards(conf):
+        conf.put()
+
+
+def _shuffledIndexes():
+    """Return all shard indexes in random order."""
+    indexes = range(SHARD_COUNT)
+    random.shuffle(indexes)
+    return indexes
+
+
+def invalidate(c_key):
+    """Move c_key's seat count to a new version once the change commits,
+    retiring any total cached under the old one.
+    """
+    versions.bumpVersion(versions.conferenceSeats(c_key))
+
+
+def takeSeat(conf):
+    """Take one seat of conf; returns False if the conference is full.
+
+    Must be called inside a (cross-group) transaction.
+    """
+    for index in _shuffledIndexes():
+        shard = _getShard(conf, index)
+        if shard.seatsTaken < _capacity(conf, index):
+            shard.seatsTaken += 1
+            shard.put()
+            invalidate(conf.key)
+            return True
+    return False
+
+
+def releaseSeat(conf):
+    """Give one seat of conf back; returns False if none were taken.
+
+    Must be called inside a (cross-group) transaction.
+    """
+    for index in _shuffledIndexes():
+        shard = _getShard(conf, index)
+        if shard.seatsTaken > 0:
+            shard.seatsTaken -= 1
+            shard.put()
+            invalidate(conf.key)
+            return True
+    return False
+
+
+@ndb.non_transactional
+def getSeatsTakenMulti(confs):
+    """Return a dict of Conference key -> seats taken for confs.
+
+    Counts are read from memcache, along with their seat versions, in a
+    single call.  The shards of any conference missing there, or cached
+    under an older version, are fetched in a single get_multi and summed.
+    The version is read before the shards, so a count is never cached
+    under a version newer than the shards it was summed from.
+    """
+    keys = []
+    for conf in confs:
+        keys.append(MEMCACHE_SEATS_KEY % conf.key.urlsafe())
+        keys.append(versions.versionKey(versions.conferenceSeats(conf.key)))
+    cached = memcache.get_multi(keys)
+    result = {}
+    missing = []
+    for conf in confs:
+        mkey = MEMCACHE_SEATS_KEY % conf.key.urlsafe()
+        resource = versions.conferenceSeats(conf.key)
+        version = versions.getVersion(
+            resource, cached.get(versions.versionKey(resource)))
+        entry = cached.get(mkey)
+        if entry and entry[0] == version:
+            result[conf.key] = entry[1]
+        else:
+            missing.append((mkey, conf, version))
+    if missing:
+        shards = ndb.get_multi([_shardKey(conf.key, index)
+                                for mkey, conf, version in missing
+                                for index in range(SHARD_COUNT)])
+        fresh = {}
+        for n, (mkey, conf, version) in enumerate(missing):
+            taken = 0
+            for index in range(SHARD_COUNT):
+                shard = shards[n * SHARD_COUNT + index]
+                taken += (shard.seatsTaken if shard
+                          else _seedTaken(conf, index))
+            result[conf.key] = taken
+            fresh[mkey] = (version, taken)
+        memcache.set_multi(fresh, time=SEATS_CACHE_TTL)
+    return result
+
+
+def getSeatsTaken(conf):
+    """Return the number of seats taken for conf."""
+    return getSeatsTakenMulti([conf])[conf.key]
+
+
+def getSeatsAvailableMulti(confs):
+    """Return a dict of Conference key -> seats available for confs.
+
+    The seats taken may be cached, but maxAttendees is always the one of
+    the Conferences given.
+    """
+    taken = getSeatsTakenMulti(confs)
+    return dict((conf.key, max((conf.maxAttendees or 0) - taken[conf.key], 0))
+                for conf in confs)
+
+
+def getSeatsAvailable(conf):
+    """Return the number of seats available for conf."""
+    return getSeatsAvailableMulti([conf])[conf.key]
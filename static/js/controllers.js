@@ -293,6 +293,12 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
      */
     $scope.conferences = [];
 
+    /**
+     * Holds the cursor for the next page of queryConferences results, if any.
+     * @type {string}
+     */
+    $scope.nextCursor = null;
+
     /**
      * Holds the state if offcanvas is enabled.
      *
@@ -426,10 +432,13 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     /**
      * Invokes the conference.queryConferences API.
      */
-    $scope.queryConferencesAll = function () {
+    $scope.queryConferencesAll = function (loadMore) {
         var sendFilters = {
             filters: []
         }
+        if (loadMore && $scope.nextCursor) {
+            sendFilters.websafeCursor = $scope.nextCursor;
+        }
         for (var i = 0; i < $scope.filters.length; i++) {
             var filter = $scope.filters[i];
             if (filter.field && filter.operator && filter.value) {
@@ -458,16 +467,28 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
                         $scope.alertStatus = 'success';
                         $log.info($scope.messages);
 
-                        $scope.conferences = [];
+                        if (!loadMore) {
+                            $scope.conferences = [];
+                        }
                         angular.forEach(resp.items, function (conference) {
                             $scope.conferences.push(conference);
                         });
+                        $scope.nextCursor = resp.more ? resp.websafeCursor : null;
                     }
                     $scope.submitted = true;
                 });
             });
     }
 
+    /**
+     * Fetches the next page of conferences for the current filters.
+     */
+    $scope.loadMoreConferences = function () {
+        if ($scope.nextCursor) {
+            $scope.queryConferencesAll(true);
+        }
+    };
+
     /**
      * Invokes the conference.getConferencesCreated method.
      */
@@ -1,11 +1,108 @@
+import hashlib
 import json
 import os
+import threading
 import time
 import uuid
 
+from google.appengine.api import memcache
 from google.appengine.api import urlfetch
 from models import Profile
 
+try:
+    from endpoints import users_id_token
+except ImportError:
+    users_id_token = None
+
+# Overridable so that a local fake tokeninfo server can stand in for Google
+TOKENINFO_URL = os.getenv('TOKENINFO_URL',
+                          'https://www.googleapis.com/oauth2/v1/tokeninfo')
+
+# Check signed ID tokens against Google's (memcached) certificates before
+# falling back to tokeninfo
+VERIFY_ID_TOKENS_LOCALLY = True
+
+# Verified tokens remembered per instance, and in memcache, until they expire
+TOKEN_CACHE_SIZE   = 1000
+MEMCACHE_TOKEN_KEY = "TOKEN_%s"  # % sha256 of the token
+
+_token_lock  = threading.Lock()
+_token_cache = {}  # token hash -> (expires, user_id)
+
+
+def _getCachedUserId(token_hash):
+    """Return the user_id verified for a token, or None if unknown or
+    expired."""
+    now = time.time()
+    with _token_lock:
+        entry = _token_cache.get(token_hash)
+        if entry and entry[0] <= now:
+            del _token_cache[token_hash]
+            entry = None
+    if not entry:
+        entry = memcache.get(MEMCACHE_TOKEN_KEY % token_hash)
+        if not entry or entry[0] <= now:
+            return None
+        _storeLocal(token_hash, entry)
+    return entry[1]
+
+
+def _storeLocal(token_hash, entry):
+    """Remember a verified token on this instance."""
+    with _token_lock:
+        if len(_token_cache) >= TOKEN_CACHE_SIZE:
+            # drop the expired tokens, or everything if none have expired
+            now = time.time()
+            for key in [key for key, (expires, _) in _token_cache.items()
+                        if expires <= now] or _token_cache.keys():
+                del _token_cache[key]
+        _token_cache[token_hash] = entry
+
+
+def _cacheUserId(token_hash, user_id, expires):
+    """Remember the user_id verified for a token until it expires."""
+    lifetime = int(expires - time.time())
+    if not user_id or lifetime <= 0:
+        return
+    entry = (expires, user_id)
+    _storeLocal(token_hash, entry)
+    memcache.set(MEMCACHE_TOKEN_KEY % token_hash, entry, time=lifetime)
+
+
+def _verifyIdToken(token):
+    """Return (user_id, expires) of a signed ID token checked against
+    Google's certificates, or None if it can't be checked locally."""
+    if not VERIFY_ID_TOKENS_LOCALLY or users_id_token is None:
+        return None
+    try:
+        payload = users_id_token._verify_signed_jwt_with_certs(
+            token, time.time(), memcache)
+    except Exception:
+        return None
+    if not payload or 'sub' not in payload or 'exp' not in payload:
+        return None
+    return payload['sub'], payload['exp']
+
+
+def _fetchTokenInfo(token, token_type):
+    """Return (user_id, expires) for a token from the tokeninfo endpoint."""
+    url = '%s?%s=%s' % (TOKENINFO_URL, token_type, token)
+    user = {}
+    wait = 1
+    for i in range(3):
+        resp = urlfetch.fetch(url)
+        if resp.status_code == 200:
+            user = json.loads(resp.content)
+            break
+        elif resp.status_code == 400 and 'invalid_token' in resp.content:
+            url = '%s?%s=%s' % (TOKENINFO_URL, 'access_token', token)
+        else:
+            time.sleep(wait)
+            wait = wait + i
+    expires = time.time() + int(user.get('expires_in', 0))
+    return user.get('user_id', ''), expires
+
+
 def getUserId(user, id_type="email"):
     if id_type == "email":
         return user.email()
@@ -14,25 +111,22 @@ def getUserId(user, id_type="email"):
         """A workaround implementation for getting userid."""
         auth = os.getenv('HTTP_AUTHORIZATION')
         bearer, token = auth.split()
+        token_hash = hashlib.sha256(token).hexdigest()
+        user_id = _getCachedUserId(token_hash)
+        if user_id:
+            return user_id
         token_type = 'id_token'
         if 'OAUTH_USER_ID' in os.environ:
             token_type = 'access_token'
-        url = ('https://www.googleapis.com/oauth2/v1/tokeninfo?%s=%s'
-               % (token_type, token))
-        user = {}
-        wait = 1
-        for i in range(3):
-            resp = urlfetch.fetch(url)
-            if resp.status_code == 200:
-                user = json.loads(resp.content)
-                break
-            elif resp.status_code == 400 and 'invalid_token' in resp.content:
-                url = ('https://www.googleapis.com/oauth2/v1/tokeninfo?%s=%s'
-                       % ('access_token', token))
-            else:
-                time.sleep(wait)
-                wait = wait + i
-        return user.get('user_id', '')
+        verified = None
+        if token_type == 'id_token':
+            verified = _verifyIdToken(token)
+        # tokeninfo is only asked when the token can't be checked here
+        if not verified:
+            verified = _fetchTokenInfo(token, token_type)
+        user_id, expires = verified
+        _cacheUserId(token_hash, user_id, expires)
+        return user_id
 
     if id_type == "custom":
         # implement your own user_id creation and getting algorythm
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""utils_test.py
+
+Udacity conference server-side Python App Engine token cache tests
+
+Runs utils.getUserId against a fake tokeninfo server on localhost, with
+TOKENINFO_URL pointed at it, on the App Engine testbed stubs:
+
+    APPENGINE_SDK=~/google_appengine python utils_test.py
+
+$Id$
+
+"""
+
+import BaseHTTPServer
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+import urlparse
+
+USER_ID = '1234567890'
+
+
+def _setupPath(sdk):
+    """Put the App Engine SDK and its bundled libraries on sys.path."""
+    if sdk:
+        sys.path.insert(0, os.path.expanduser(sdk))
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeTokenInfo(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers tokeninfo lookups; a token 'good-<seconds>' is valid for
+    that many seconds, any other token is invalid.
+    """
+    fetches = []  # tokens looked up, in order
+
+    def do_GET(self):
+        query = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+        token = (query.get('access_token') or query.get('id_token'))[0]
+        self.fetches.append(token)
+        if token.startswith('good-'):
+            status, body = 200, {'user_id'    : USER_ID,
+                                 'expires_in' : int(token[len('good-'):])}
+        else:
+            status, body = 400, {'error': 'invalid_token'}
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body))
+
+    def log_message(self, *args):
+        pass
+
+
+class GetUserIdTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                               FakeTokenInfo)
+        thread = threading.Thread(target=cls.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        from google.appengine.ext import testbed
+        import utils
+
+        self.bed = testbed.Testbed()
+        self.bed.activate()
+        self.bed.setup_env(app_id='udacity-p4-conforg', overwrite=True)
+        self.bed.init_memcache_stub()
+        self.bed.init_urlfetch_stub()
+        self.utils = utils
+        self.tokeninfoUrl = utils.TOKENINFO_URL
+        utils.TOKENINFO_URL = 'http://127.0.0.1:%d/tokeninfo' % (
+            self.server.server_address[1])
+        utils._token_cache.clear()
+        del FakeTokenInfo.fetches[:]
+        # access tokens always go to tokeninfo
+        os.environ['OAUTH_USER_ID'] = USER_ID
+
+    def tearDown(self):
+        self.utils.TOKENINFO_URL = self.tokeninfoUrl
+        self.utils._token_cache.clear()
+        os.environ.pop('OAUTH_USER_ID', None)
+        os.environ.pop('HTTP_AUTHORIZATION', None)
+        self.bed.deactivate()
+
+    def getUserId(self, token):
+        os.environ['HTTP_AUTHORIZATION'] = 'Bearer %s' % token
+        return self.utils.getUserId(None, id_type='oauth')
+
+    def testCacheHitSkipsFetch(self):
+        self.assertEqual(self.getUserId('good-3600'), USER_ID)
+        self.assertEqual(self.getUserId('good-3600'), USER_ID)
+        self.assertEqual(FakeTokenInfo.fetches, ['good-3600'])
+        # other instances find the token in memcache
+        self.utils._token_cache.clear()
+        self.assertEqual(self.getUserId('good-3600'), USER_ID)
+        self.assertEqual(FakeTokenInfo.fetches, ['good-3600'])
+
+    def testExpiredTokenIsFetchedAgain(self):
+        self.assertEqual(self.getUserId('good-2'), USER_ID)
+        time.sleep(2.5)
+        self.assertEqual(self.getUserId('good-2'), USER_ID)
+        self.assertEqual(FakeTokenInfo.fetches, ['good-2', 'good-2'])
+
+    def testFailedLookupIsNotCached(self):
+        self.assertEqual(self.getUserId('bad'), '')
+        fetched = len(FakeTokenInfo.fetches)
+        self.assertTrue(fetched > 0)
+        self.assertEqual(self.getUserId('bad'), '')
+        self.assertEqual(len(FakeTokenInfo.fetches), 2 * fetched)
+
+
+if __name__ == '__main__':
+    _setupPath(os.getenv('APPENGINE_SDK'))
+    unittest.main()
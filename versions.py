@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""versions.py
+
+Udacity conference server-side Python App Engine resource version stamps;
+    a client that sends back the stamp it last saw can be told the
+    resource is unchanged without reading or serializing it again
+
+$Id$
+
+"""
+
+import time
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+MEMCACHE_VERSION_KEY = "VERSION_%s"  # % resource
+
+# Resource names
+ANNOUNCEMENT = "announcement"
+CONFERENCES  = "conferences"  # any Conference, or its seats, changing
+
+
+def conference(c_key):
+    """Return the resource name of a Conference."""
+    return 'conference:%s' % c_key.urlsafe()
+
+
+def conferenceSeats(c_key):
+    """Return the resource name of a Conference's seat count."""
+    return 'seats:%s' % c_key.urlsafe()
+
+
+def conferenceSessions(c_key):
+    """Return the resource name of a Conference's Sessions."""
+    return 'sessions:%s' % c_key.urlsafe()
+
+
+def featuredSpeaker(c_key):
+    """Return the resource name of a Conference's featured speaker."""
+    return 'featured_speaker:%s' % c_key.urlsafe()
+
+
+def _now():
+    """Return a fresh, increasing starting stamp."""
+    return int(time.time() * 1000)
+
+
+def versionKey(resource):
+    """Return the memcache key holding resource's version stamp, so that
+    callers can read it together with other keys.
+    """
+    return MEMCACHE_VERSION_KEY % resource
+
+
+def getVersion(resource, version=None):
+    """Return the current version stamp of resource as a string.
+
+    A stamp already read from versionKey(resource) can be passed in as
+    version.  A stamp lost to memcache eviction is restarted from the
+    clock, so it never matches a stamp handed out before.
+    """
+    key = versionKey(resource)
+    if version is None:
+        version = memcache.get(key)
+    if version is None:
+        memcache.add(key, _now())
+        # without memcache, hand out stamps that never match
+        version = memcache.get(key) or _now()
+    return str(version)
+
+
+def bumpVersion(resource):
+    """Move resource to a new version stamp once the current write (or
+    transaction) commits.
+    """
+    ndb.get_context().call_on_commit(
+        lambda: memcache.incr(versionKey(resource),
+                              initial_value=_now()))